@@ -1,6 +1,23 @@
+import base64
+import heapq
+import json
+import math
+import mmap
 import os
+import random
+import re
+import sqlite3
+import struct
+import sys
+import tempfile
 import threading
 import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 from datetime import datetime, timezone, timedelta
 from urllib.parse import quote_plus
 
@@ -14,14 +31,23 @@ from flask import (
     session,
     abort,
     flash,
+    Response,
+    g,
+    has_request_context,
 )
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as _FsaSession
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.dml import UpdateBase
 from werkzeug.security import generate_password_hash, check_password_hash
 
-import requests
-
-# OAuth (opsiyonel)
-from authlib.integrations.flask_client import OAuth
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 
 # ----------------------------
@@ -30,37 +56,100 @@ from authlib.integrations.flask_client import OAuth
 app = Flask(__name__, template_folder="templates")
 app.secret_key = os.environ.get("SECRET_KEY", "dev-secret-change-me")
 
-# DATABASE_URL (Railway)
-db_url = os.environ.get("DATABASE_URL")
-if db_url and db_url.startswith("postgres://"):
-    db_url = db_url.replace("postgres://", "postgresql://", 1)
+def _normalize_db_url(url):
+    if url and url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+# DATABASE_URL (Railway); DATABASE_REPLICA_URL opsiyonel okuma replikası
+db_url = _normalize_db_url(os.environ.get("DATABASE_URL"))
+db_replica_url = _normalize_db_url(os.environ.get("DATABASE_REPLICA_URL"))
+
+# Havuz worker başına: her gthread thread'i en fazla bir bağlantı tutar,
+# DB_MAX_CONNECTIONS bütçesi WEB_CONCURRENCY (gunicorn worker sayısı) arasında bölünür
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "64"))
+# gevent worker'da eşzamanlı bağlantı (greenlet) sınırı; bkz. gunicorn.conf.py
+GUNICORN_WORKER_CONNECTIONS = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "2000"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "80"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or max(1, min(GUNICORN_THREADS, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)))
+
+
+def _engine_options(url: str) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS; DB_* env'lerinden"""
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        return {}  # StaticPool, havuz ayarı yok
+    opts = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "0")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+    if url.startswith("postgresql"):
+        connect_args = {"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "5"))}
+        statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+        if statement_timeout_ms > 0:
+            connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+        opts["connect_args"] = connect_args
+    return opts
+
+
+class _RoutingSession(_FsaSession):
+    """Okuma endpoint'lerinde SELECT'leri replikaya yollar. Flush, DML ve
+    isteğin ilk yazmasından sonraki her şey primary'de kalır."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase) and read_from_replica():
+            return self._db.engines["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 
 app.config["SQLALCHEMY_DATABASE_URI"] = db_url or "sqlite:///local.db"
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+if db_replica_url:
+    app.config["SQLALCHEMY_BINDS"] = {"replica": {"url": db_replica_url, **_engine_options(db_replica_url)}}
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={"class_": _RoutingSession})
 
 # ----------------------------
 # OAuth (Google) - Opsiyonel
 # ----------------------------
-oauth = OAuth(app)
+# authlib ilk Google girişinde import edilir; worker açılışını yavaşlatmasın
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
-
-if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET:
-    oauth.register(
-        name="google",
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET,
-        server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-        client_kwargs={"scope": "openid email profile"},
-    )
+_oauth = None
+_oauth_lock = threading.Lock()
+
+
+def google_oauth():
+    global _oauth
+    with _oauth_lock:
+        if _oauth is None:
+            from authlib.integrations.flask_client import OAuth
+
+            oauth = OAuth(app)
+            oauth.register(
+                name="google",
+                client_id=GOOGLE_CLIENT_ID,
+                client_secret=GOOGLE_CLIENT_SECRET,
+                server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+                client_kwargs={"scope": "openid email profile"},
+            )
+            _oauth = oauth
+    return _oauth.google
 
 # ----------------------------
 # Models
 # ----------------------------
+# SQLite'ta sadece INTEGER PRIMARY KEY autoincrement olur
+BigIntPK = db.BigInteger().with_variant(db.Integer(), "sqlite")
+
+
 class User(db.Model):
     __tablename__ = "users"
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntPK, primary_key=True)
     username = db.Column(db.String(32), unique=True, nullable=False, index=True)
     full_name = db.Column(db.String(100), nullable=False)
     bio = db.Column(db.String(160), nullable=True)
@@ -71,12 +160,16 @@ class User(db.Model):
     avatar_type = db.Column(db.String(16), nullable=False, default="ui")
     avatar_url = db.Column(db.Text, nullable=True)
 
+    # Denormalize takip sayaçları: her profil görüntülemede follows COUNT(*) yerine
+    followers_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
 
 
 class Follow(db.Model):
     __tablename__ = "follows"
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntPK, primary_key=True)
     follower_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     following_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
@@ -85,46 +178,65 @@ class Follow(db.Model):
 
 class Post(db.Model):
     __tablename__ = "posts"
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntPK, primary_key=True)
     user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     content = db.Column(db.Text, nullable=False)
     symbol_key = db.Column(db.String(16), nullable=True, index=True)
     image_url = db.Column(db.Text, nullable=True)
+    # Denormalize rating özeti: post_ratings üzerinde aggregate yerine kolon okuması
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Keşfet leaderboard skoru: avg * (1 + cnt/5), rating değiştikçe güncellenir
+    top_score = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    __table_args__ = (
+        db.Index("ix_posts_top_score", top_score.desc(), id.desc()),
+        db.Index("ix_posts_user_created", user_id, created_at.desc(), id.desc()),
+    )
 
 
 class PostRating(db.Model):
     __tablename__ = "post_ratings"
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntPK, primary_key=True)
     post_id = db.Column(db.BigInteger, db.ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
     user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     stars = db.Column(db.SmallInteger, nullable=False)
+    # Upsert'te güncellenen satırın eski değeri; RETURNING ile delta hesaplanır
+    prev_stars = db.Column(db.SmallInteger, nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
     __table_args__ = (db.UniqueConstraint("post_id", "user_id", name="uq_post_rating_once"),)
 
 
 class SymbolComment(db.Model):
     __tablename__ = "symbol_comments"
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntPK, primary_key=True)
     symbol_key = db.Column(db.String(16), nullable=False, index=True)
     user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     content = db.Column(db.Text, nullable=False)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    __table_args__ = (
+        db.Index("ix_symbol_comments_symbol_created", symbol_key, created_at.desc(), id.desc()),
+        db.Index("ix_symbol_comments_user_created", user_id, created_at.desc(), id.desc()),
+    )
 
 
 class CommentRating(db.Model):
     __tablename__ = "comment_ratings"
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntPK, primary_key=True)
     comment_id = db.Column(db.BigInteger, db.ForeignKey("symbol_comments.id", ondelete="CASCADE"), nullable=False, index=True)
     user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     stars = db.Column(db.SmallInteger, nullable=False)
+    # Upsert'te güncellenen satırın eski değeri; RETURNING ile delta hesaplanır
+    prev_stars = db.Column(db.SmallInteger, nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
     __table_args__ = (db.UniqueConstraint("comment_id", "user_id", name="uq_comment_rating_once"),)
 
 
 class PriceAlert(db.Model):
     __tablename__ = "price_alerts"
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntPK, primary_key=True)
     symbol_key = db.Column(db.String(16), nullable=False, index=True)
     change_pct = db.Column(db.Float, nullable=False)
     window = db.Column(db.String(8), nullable=False, default="1d")
@@ -132,13 +244,277 @@ class PriceAlert(db.Model):
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
 
 
+class SymbolActivity(db.Model):
+    """Sembol başına saatlik yorum sayacı (bucket = epoch saat)"""
+    __tablename__ = "symbol_activity"
+    id = db.Column(BigIntPK, primary_key=True)
+    symbol_key = db.Column(db.String(16), nullable=False)
+    bucket = db.Column(db.BigInteger, nullable=False)
+    cnt = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (db.UniqueConstraint("symbol_key", "bucket", name="uq_symbol_activity_bucket"),)
+
+
+class SymbolTrend(db.Model):
+    """Sembol başına exponential decay'li trend skoru (updated_at anına göre)"""
+    __tablename__ = "symbol_trends"
+    symbol_key = db.Column(db.String(16), primary_key=True)
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.Float, nullable=False)  # epoch saniye
+
+
 class FeedEvent(db.Model):
     __tablename__ = "feed_events"
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntPK, primary_key=True)
     type = db.Column(db.String(16), nullable=False)
     ref_id = db.Column(db.BigInteger, nullable=False, index=True)
     score = db.Column(db.Float, nullable=False, default=0.0)
+    # Sıralama anahtarı: log10(ağırlık) + yaş; zamanla değişmediği için index'te sabit kalır
+    hot = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+    # "hot" filtresi (score > HOT_SCORE_THRESHOLD), index'lenebilsin diye kolon olarak
+    is_hot = db.Column(db.Boolean, nullable=False, default=False, server_default="false")
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    # /api/feed filtrelerinin her biri için tek index aralığı: all, posts/alerts, hot
+    __table_args__ = (
+        db.Index("ix_feed_events_hot", hot.desc(), id.desc()),
+        db.Index("ix_feed_events_type_hot", type, hot.desc(), id.desc()),
+        db.Index("ix_feed_events_is_hot", is_hot, hot.desc(), id.desc()),
+    )
+
+
+class TimelineEntry(db.Model):
+    """Takip akışı inbox'ı: takip edilen yazarların postları, yazıldığı anda
+    takipçinin satırına kopyalanır (fan-out on write)."""
+    __tablename__ = "timeline_entries"
+    id = db.Column(BigIntPK, primary_key=True)
+    user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    post_id = db.Column(db.BigInteger, db.ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
+    author_id = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "post_id", name="uq_timeline_user_post"),
+        db.Index("ix_timeline_user_created", user_id, created_at.desc(), post_id.desc()),
+        db.Index("ix_timeline_user_author", user_id, author_id),
+    )
+
+
+class PriceTick(db.Model):
+    __tablename__ = "price_ticks"
+    id = db.Column(BigIntPK, primary_key=True)
+    symbol_key = db.Column(db.String(16), nullable=False)
+    ts = db.Column(db.Float, nullable=False)  # epoch saniye
+    price = db.Column(db.Float, nullable=False)
+    __table_args__ = (db.Index("ix_price_ticks_symbol_ts", "symbol_key", "ts"),)
+
+
+# SQLite'ta exp() her build'de yok; trend decay'i SQL içinde hesaplanıyor
+@event.listens_for(Engine, "connect")
+def _sqlite_functions(dbapi_conn, _record):
+    if isinstance(dbapi_conn, sqlite3.Connection):
+        dbapi_conn.create_function("exp", 1, math.exp, deterministic=True)
+        # FTS5 tetikleyicileri metni Python tarafıyla aynı kuralla katlar
+        dbapi_conn.create_function("search_fold", 1, search_fold, deterministic=True)
+
+
+# ----------------------------
+# SQL instrumentation (istek başına statement sayısı, DB süresi, N+1)
+# ----------------------------
+SQL_SLOW_TOP = int(os.getenv("SQL_SLOW_TOP", "5"))
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", "10"))
+# raise | warn | off; boşsa debug/testing'de raise, production'da warn
+NPLUSONE_MODE = os.getenv("NPLUSONE_MODE", "").strip().lower()
+INTERNAL_METRICS_TOKEN = os.getenv("INTERNAL_METRICS_TOKEN")
+
+# IN (?, ?, ?) / IN (%(p_1)s, %(p_2)s) listelerini tek yer tutucuya indirir
+_SQL_LIST_RE = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))*\s*\)")
+_SQL_SPACE_RE = re.compile(r"\s+")
+
+
+class NPlusOneError(RuntimeError):
+    """Aynı statement şekli tek istekte NPLUSONE_THRESHOLD'u aştı"""
+
+
+@lru_cache(maxsize=1024)
+def _sql_shape(statement: str) -> str:
+    return _SQL_LIST_RE.sub("(?)", _SQL_SPACE_RE.sub(" ", statement).strip())
+
+
+class _SqlStats:
+    """Tek isteğin SQL sayaçları (flask.g üzerinde)"""
+
+    __slots__ = ("count", "total", "shapes", "slow")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.shapes = {}  # shape -> [execution sayısı, son execution no]
+        self.slow = []  # min-heap (süre, shape), en yavaş SQL_SLOW_TOP
+
+
+class _SqlMetrics:
+    """Worker içi endpoint toplamları; /internal/metrics buradan okur"""
+
+    def __init__(self, top: int):
+        self.top = top
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self.endpoints = {}  # endpoint -> [istek, statement, db_sn, max_statement, n+1]
+        self.slow = []  # min-heap (süre, shape, endpoint)
+        self.nplusone = deque(maxlen=50)
+
+    def record(self, endpoint: str, stats: _SqlStats, suspects: dict):
+        with self._lock:
+            row = self.endpoints.setdefault(endpoint, [0, 0, 0.0, 0, 0])
+            row[0] += 1
+            row[1] += stats.count
+            row[2] += stats.total
+            row[3] = max(row[3], stats.count)
+            row[4] += bool(suspects)
+            for dt, shape in stats.slow:
+                item = (dt, shape, endpoint)
+                if len(self.slow) < self.top:
+                    heapq.heappush(self.slow, item)
+                elif dt > self.slow[0][0]:
+                    heapq.heapreplace(self.slow, item)
+            if suspects:
+                self.nplusone.append({"at": int(time.time()), "endpoint": endpoint, "shapes": suspects})
+
+    def totals(self):
+        with self._lock:
+            return sorted((ep, tuple(row)) for ep, row in self.endpoints.items())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            endpoints = {
+                ep: {
+                    "requests": n,
+                    "statements": stmts,
+                    "statements_per_request": round(stmts / n, 2),
+                    "db_ms_per_request": round(total * 1000 / n, 3),
+                    "max_statements": mx,
+                    "nplusone_requests": flagged,
+                }
+                for ep, (n, stmts, total, mx, flagged) in sorted(self.endpoints.items())
+            }
+            slow = [{"ms": round(dt * 1000, 3), "endpoint": ep, "statement": shape}
+                    for dt, shape, ep in sorted(self.slow, reverse=True)]
+            return {"endpoints": endpoints, "slowest": slow, "nplusone_recent": list(self.nplusone)}
+
+
+sql_metrics = _SqlMetrics(SQL_SLOW_TOP)
+
+
+def _request_sql_stats():
+    return g.get("_sql_stats") if has_request_context() else None
+
+
+# Başlangıç zamanı statement'ın execution context'inde tutulur: hata veren
+# statement'larda after_cursor_execute hiç gelmez, context ile birlikte atılır.
+# Context'siz iç çağrılar (ör. sequence ön-çalıştırma) bağlantıda tek slot kullanır.
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_timer_start(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._sql_t0 = time.perf_counter()
+    else:
+        conn.info["_sql_t0"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_timer_stop(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        started = getattr(context, "_sql_t0", None)
+    else:
+        started = conn.info.pop("_sql_t0", None)
+    if started is None:
+        return
+    dt = time.perf_counter() - started
+    stats = _request_sql_stats()
+    if stats is None:
+        return  # CLI / arka plan thread'leri
+    shape = _sql_shape(statement)
+    stats.count += 1
+    stats.total += dt
+    # insertmanyvalues tek execute()'u satır/batch başına böler; N+1 sayımında
+    # aynı execution context'i bir kez say
+    execution = getattr(context, "_sql_execution", None)
+    if execution is None:
+        execution = context._sql_execution = stats.count
+    seen = stats.shapes.get(shape)
+    if seen is None:
+        stats.shapes[shape] = [1, execution]
+    elif seen[1] != execution:
+        seen[0] += 1
+        seen[1] = execution
+    if len(stats.slow) < SQL_SLOW_TOP:
+        heapq.heappush(stats.slow, (dt, shape))
+    elif dt > stats.slow[0][0]:
+        heapq.heapreplace(stats.slow, (dt, shape))
+
+
+@app.before_request
+def _sql_stats_begin():
+    g._sql_stats = _SqlStats()
+    g._request_t0 = time.perf_counter()
+
+
+@app.after_request
+def _sql_stats_end(resp):
+    stats = g.pop("_sql_stats", None)
+    if stats is None:
+        return resp
+    elapsed = time.perf_counter() - g.pop("_request_t0")
+    resp.headers.add("Server-Timing", f'db;dur={stats.total * 1000:.2f};desc="{stats.count} queries"')
+    resp.headers.add("Server-Timing", f"app;dur={elapsed * 1000:.2f}")
+
+    suspects = {shape: n for shape, (n, _) in stats.shapes.items() if n > NPLUSONE_THRESHOLD}
+    sql_metrics.record(request.endpoint or "<unmatched>", stats, suspects)
+    mode = NPLUSONE_MODE or ("raise" if app.debug or app.testing else "warn")
+    if suspects and mode != "off":
+        detail = "; ".join(f"{n}x {shape[:160]}" for shape, n in suspects.items())
+        if mode == "raise":
+            raise NPlusOneError(f"{request.method} {request.path}: {detail}")
+        print(f"⚠️ N+1 şüphesi {request.method} {request.path}: {detail}")
+    return resp
+
+
+# ----------------------------
+# Read replica routing
+# ----------------------------
+# Replika gecikmesi için üst sınır: yazan kullanıcı bu süre primary'ye yapışır,
+# replikadan hesaplanan cache kayıtları ve ETag'ler de en fazla bu kadar yaşar
+REPLICA_LAG_SECONDS = int(os.getenv("REPLICA_LAG_SECONDS", "10"))
+REPLICA_READ_ENDPOINTS = frozenset({
+    "feed", "explore", "profile", "symbol_page",
+    "api_feed", "api_explore", "api_profile", "api_symbol_comments",
+})
+
+
+def read_from_replica() -> bool:
+    return has_request_context() and g.get("_db_route") == "replica" and not g.get("_db_wrote")
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _note_write(conn, cursor, statement, parameters, context, executemany):
+    if (context.isinsert or context.isupdate or context.isdelete) and has_request_context():
+        g._db_wrote = True
+
+
+@app.before_request
+def _choose_db_route():
+    if (
+        db_replica_url
+        and request.method in ("GET", "HEAD")
+        and request.endpoint in REPLICA_READ_ENDPOINTS
+        and session.get("primary_until", 0) <= time.time()
+    ):
+        g._db_route = "replica"
+
+
+@app.after_request
+def _stick_to_primary(resp):
+    """Read-your-writes: yazan oturum bir süre replikayı atlar"""
+    if db_replica_url and g.get("_db_wrote"):
+        session["primary_until"] = int(time.time()) + REPLICA_LAG_SECONDS
+    return resp
 
 
 # ----------------------------
@@ -149,10 +525,50 @@ def now_utc():
 
 
 def current_user():
+    """Oturumdaki kullanıcı; istek başına bir kez yüklenir (flask.g)"""
     uid = session.get("user_id")
     if not uid:
         return None
-    return db.session.get(User, uid)
+    cached = g.get("_current_user")
+    if cached is None or cached[0] != uid:
+        cached = g._current_user = (uid, db.session.get(User, uid))
+    return cached[1]
+
+
+# Şablonların ihtiyaç duyduğu kadar kimlik bilgisi; session cookie'si zaten
+# SECRET_KEY ile imzalı olduğundan sahte snapshot üretilemez
+Identity = namedtuple("Identity", "id username full_name avatar_url")
+IDENTITY_TTL_SECONDS = int(os.getenv("IDENTITY_TTL_SECONDS", "300"))
+
+
+def remember_identity(u):
+    """Kimlik snapshot'ını session'a yazar (login ve profil değişikliğinde)"""
+    avatar = u.avatar_url if u.avatar_type == "preset" and u.avatar_url else ui_avatar_url(u.full_name)
+    session["ident"] = [u.id, u.username, u.full_name, avatar, int(time.time()) + IDENTITY_TTL_SECONDS]
+    g._identity = Identity(u.id, u.username, u.full_name, avatar)
+
+
+def current_identity():
+    """Salt okunur sayfalar için hafif kimlik: geçerli snapshot varsa users
+    tablosuna gitmez, yoksa current_user()'dan yeniler."""
+    uid = session.get("user_id")
+    if not uid:
+        return None
+    ident = g.get("_identity")
+    if ident is not None and ident.id == uid:
+        return ident
+
+    snap = session.get("ident")
+    if isinstance(snap, list) and len(snap) == 5 and snap[0] == uid and snap[4] > time.time():
+        g._identity = Identity(*snap[:4])
+        return g._identity
+
+    u = current_user()
+    if not u:
+        session.pop("ident", None)
+        return None
+    remember_identity(u)
+    return g._identity
 
 
 def login_required():
@@ -173,6 +589,62 @@ def username_is_valid(u: str) -> bool:
     return all(ch in allowed for ch in u)
 
 
+# ----------------------------
+# Cursor (keyset) pagination
+# ----------------------------
+def encode_cursor(values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, columns):
+    """Opak cursor -> kolon tiplerine göre değerler; bozuksa ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("invalid cursor")
+
+    out = []
+    for col, v in zip(columns, values):
+        if isinstance(col.type, db.DateTime):
+            if not isinstance(v, str):
+                raise ValueError("invalid cursor")
+            v = datetime.fromisoformat(v)
+        elif not isinstance(v, (int, float)):
+            raise ValueError("invalid cursor")
+        out.append(v)
+    return out
+
+
+def keyset_page(query, columns, cursor, limit):
+    """columns'a göre DESC sıralı sayfa: (rows, next_cursor).
+
+    OFFSET yerine son satırın (kolon değerleri) < karşılaştırması kullanılır;
+    eşleşen composite index ile derin sayfalar da ilk sayfa kadar ucuzdur ve
+    araya yeni satır girmesi kayma/tekrar yaratmaz.
+    """
+    if cursor:
+        query = query.filter(db.tuple_(*columns) < tuple(decode_cursor(cursor, columns)))
+    rows = query.order_by(*[c.desc() for c in columns]).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    return rows, next_cursor
+
+
+def page_limit(default: int, maximum: int = 100) -> int:
+    try:
+        n = int(request.args.get("limit", default))
+    except ValueError:
+        n = default
+    return max(1, min(n, maximum))
+
+
 # ----------------------------
 # Finance Data (MULTI-SOURCE API)
 # ----------------------------
@@ -189,6 +661,9 @@ PRICE_SYMBOLS = {
 CACHE_TTL_SECONDS = 30
 _last_good = {"data": None, "ts": 0.0}
 _lock = threading.Lock()
+# Fiyat değerleri değiştiğinde SSE stream'lerini uyandırır; versiyon = o snapshot'ın ts'i (ms)
+_price_cond = threading.Condition(_lock)
+_price_version = 0
 _worker_started = False
 
 
@@ -213,123 +688,344 @@ def _safe_float(x):
         return None
 
 
-def _fetch_prices_batch():
-    """Multi-source API ile veri çekimi"""
+# Her sağlayıcı kendi keep-alive Session'ını kullanır (bağlantı havuzu yeniden kullanılır)
+PRICE_FETCH_TIMEOUT = 5
+PRICE_REFRESH_DEADLINE_SECONDS = float(os.environ.get("PRICE_REFRESH_DEADLINE_SECONDS", "8"))
+_HTTP_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_fetch_pool = None
+
+
+def _provider_session(name: str):
+    # requests yalnız fiyat thread'i başlayınca yüklenir (import süresi)
+    import requests
+
+    with _sessions_lock:
+        s = _sessions.get(name)
+        if s is None:
+            s = requests.Session()
+            s.headers.update(_HTTP_HEADERS)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2)
+            s.mount("https://", adapter)
+            _sessions[name] = s
+        return s
+
+
+def _fetch_crypto(s):
+    """KRİPTO (CoinGecko)"""
+    r = s.get(
+        "https://api.coingecko.com/api/v3/simple/price",
+        params={"ids": "bitcoin", "vs_currencies": "usd"},
+        timeout=PRICE_FETCH_TIMEOUT,
+    )
+    r.raise_for_status()
+    btc = _safe_float(r.json().get("bitcoin", {}).get("usd"))
+    print(f"✓ BTC: ${btc}")
+    return {"btc": btc}
+
+
+def _fetch_fx(s):
+    """DÖVİZ (ExchangeRate-API)"""
+    r = s.get("https://api.exchangerate-api.com/v4/latest/USD", timeout=PRICE_FETCH_TIMEOUT)
+    r.raise_for_status()
+    rates = r.json().get("rates", {})
+    usd_try = _safe_float(rates.get("TRY"))
+    eur_try = None
+
+    eur_rate = _safe_float(rates.get("EUR"))
+    if eur_rate and usd_try:
+        eur_try = usd_try / eur_rate
+
+    print(f"✓ USD/TRY: {usd_try}")
+    print(f"✓ EUR/TRY: {eur_try}")
+    return {"usd_try": usd_try, "eur_try": eur_try}
+
+
+def _fetch_metals(s):
+    """ALTIN, GÜMÜŞ, BAKIR (Metals-API)"""
+    METALS_API_KEY = os.environ.get("METALS_API_KEY")
+    if not METALS_API_KEY:
+        print("⚠ Metals-API key yok, fallback değerler kullanılıyor")
+        return {}
+
+    r = s.get(
+        "https://metals-api.com/api/latest",
+        params={"access_key": METALS_API_KEY, "base": "USD", "symbols": "XAU,XAG,XCU"},
+        timeout=PRICE_FETCH_TIMEOUT,
+    )
+    r.raise_for_status()
+    metals_data = r.json()
+    out = {}
+    if metals_data.get("success"):
+        rates = metals_data.get("rates", {})
+        if rates.get("XAU"):
+            out["gold"] = 1 / _safe_float(rates["XAU"])
+        if rates.get("XAG"):
+            out["silver"] = 1 / _safe_float(rates["XAG"])
+        if rates.get("XCU"):
+            out["copper"] = 1 / _safe_float(rates["XCU"])
+
+        print(f"✓ Gold: ${out.get('gold')}")
+        print(f"✓ Silver: ${out.get('silver')}")
+    return out
+
+
+def _fetch_bist(s):
+    """BIST 100 (bigpara)"""
+    r = s.get("https://api.bigpara.hurriyet.com.tr/doviz/headerlist/anasayfa", timeout=PRICE_FETCH_TIMEOUT)
+    r.raise_for_status()
+    bist_data = r.json()
+
+    # API bazen string dönüyor
+    if isinstance(bist_data, str):
+        try:
+            bist_data = json.loads(bist_data)
+        except ValueError:
+            bist_data = []
+
+    if isinstance(bist_data, list):
+        for item in bist_data:
+            if isinstance(item, dict) and item.get("SEMBOL") == "XU100":
+                bist100 = _safe_float(item.get("KAPANIS"))
+                print(f"✓ BIST100: {bist100}")
+                return {"bist100": bist100}
+    raise ValueError("XU100 yanıtta yok")
+
+
+# Sağlayıcı başına polling aralığı (saniye): CoinGecko/BIST hızlı, FX ve Metals (kota) yavaş
+_PRICE_PROVIDERS = (
+    ("CoinGecko", _fetch_crypto, 15, ("btc",)),
+    ("ExchangeRate", _fetch_fx, 300, ("usd_try", "eur_try")),
+    ("Metals-API", _fetch_metals, 600, ("gold", "silver", "copper")),
+    ("BIST100", _fetch_bist, 30, ("bist100",)),
+)
+# Alan, sağlayıcısının aralığının bu katından eskiyse "stale" sayılır
+PRICE_STALE_FACTOR = 2
+
+PRICE_BACKOFF_MAX_SECONDS = 900
+PRICE_BREAKER_THRESHOLD = 5
+PRICE_BREAKER_COOLDOWN_SECONDS = 600
+
+
+class _ProviderState:
+    """Sağlayıcı başına zamanlama: kendi aralığı, hata sonrası jitter'lı
+    exponential backoff ve art arda hatalarda circuit breaker."""
+
+    def __init__(self, name, fn, interval):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.next_due = 0.0
+        self.failures = 0
+        self.open_until = 0.0
+        # Son çağrının future'ı; deadline'ı kaçırsa da arka planda sürer
+        self.pending = None
+
+    def busy(self) -> bool:
+        """Önceki çağrı hâlâ sağlayıcının Session'ını kullanıyor mu?"""
+        return self.pending is not None and not self.pending.done()
+
+    def due(self, now: float) -> bool:
+        return now >= self.next_due and not self.busy()
+
+    def record_success(self, now: float):
+        if self.open_until:
+            print(f"🟢 {self.name} circuit kapandı")
+        self.failures = 0
+        self.open_until = 0.0
+        self.next_due = now + self.interval
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        if self.failures >= PRICE_BREAKER_THRESHOLD:
+            # Half-open: cooldown sonunda tek deneme; o da düşerse tekrar açılır
+            self.open_until = now + PRICE_BREAKER_COOLDOWN_SECONDS
+            self.next_due = self.open_until
+            print(f"🔴 {self.name} circuit açık ({self.failures} hata), {PRICE_BREAKER_COOLDOWN_SECONDS}s beklenecek")
+            return
+
+        backoff = min(PRICE_BACKOFF_MAX_SECONDS, self.interval * (2 ** self.failures))
+        self.next_due = now + random.uniform(backoff / 2, backoff)
+
+
+_provider_states = [_ProviderState(name, fn, interval) for name, fn, interval, _ in _PRICE_PROVIDERS]
+_field_intervals = {k: interval for _, _, interval, fields in _PRICE_PROVIDERS for k in fields}
+# Türetilmiş alan: iki girdisinden eskisi kadar taze
+_field_intervals["gram_altin"] = max(_field_intervals["gold"], _field_intervals["usd_try"])
+
+
+# Sağlayıcıdan gelmezse kullanılan sabit değerler
+_FALLBACK_PRICES = {
+    "gold": 2750.0,
+    "silver": 31.5,
+    "copper": 4.2,
+    "bist100": 10850.0,
+}
+
+
+def _is_fallback(data: dict, k: str) -> bool:
+    """Alan sağlayıcıdan gelmedi mi (sabit fallback ya da ondan türetilmiş)?"""
+    as_of = data.get("as_of")
+    if as_of is None:
+        # as_of'suz eski snapshot formatı
+        return data.get(k) == _FALLBACK_PRICES.get(k)
+    return data.get(k) is not None and not as_of.get(k)
+
+
+def price_field_status(data: dict, now_ts: float) -> dict:
+    """Alan başına live / stale / fallback / missing"""
+    as_of = data.get("as_of") or {}
+    out = {}
+    for k in HISTORY_KEYS:
+        if data.get(k) is None:
+            out[k] = "missing"
+        elif _is_fallback(data, k):
+            out[k] = "fallback"
+        else:
+            limit = PRICE_STALE_FACTOR * _field_intervals[k] + PRICE_REFRESH_DEADLINE_SECONDS
+            out[k] = "live" if now_ts - as_of.get(k, 0) <= limit else "stale"
+    return out
+
+
+# ----------------------------
+# Price telemetry (Prometheus text formatı)
+# ----------------------------
+PRICE_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PRICE_REFRESH_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Histogram:
+    """Sabit bucket'lı histogram. Tek yazar varsayılır (fiyat thread'i);
+    okuyucu kilitsiz okur, en kötü ihtimalle bir gözlem geriden gelir."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # son bucket +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            total += n
+            yield ("+Inf" if bound == float("inf") else repr(bound)), total
+
+
+class _PriceTelemetry:
+    """Fiyat fetcher'ının sayaçları. Yazmaların hepsi _bg_loop thread'inden;
+    anahtarlar baştan oluşturulur, böylece scrape sırasında dict boyutu değişmez.
+    Sağlayıcı sayaçları yalnız lider worker'da ilerler (price_fetch_leader)."""
+
+    def __init__(self):
+        names = [name for name, _, _, _ in _PRICE_PROVIDERS]
+        self.provider_calls = {(n, o): 0 for n in names for o in ("success", "error", "timeout")}
+        self.provider_latency = {n: _Histogram(PRICE_LATENCY_BUCKETS) for n in names}
+        self.fallbacks = {k: 0 for k in _FALLBACK_PRICES}
+        self.refresh = _Histogram(PRICE_REFRESH_BUCKETS)
+        self.refreshes = {"published": 0, "empty": 0}
+
+
+price_telemetry = _PriceTelemetry()
+
+
+def _price_pool() -> ThreadPoolExecutor:
+    global _fetch_pool
+    if _fetch_pool is None:
+        # Sağlayıcı başına en fazla bir çağrı uçuşta (bkz. _ProviderState.busy)
+        _fetch_pool = ThreadPoolExecutor(max_workers=len(_provider_states), thread_name_prefix="price-fetch")
+    return _fetch_pool
+
+
+def _timed_fetch(fn, session):
+    """Havuz thread'inde çalışır; paylaşılan duruma yazmaz, süreyi sonuçla birlikte döner"""
+    t = time.perf_counter()
+    try:
+        part = fn(session)
+    except Exception as e:
+        return time.perf_counter() - t, None, e
+    return time.perf_counter() - t, part, None
+
+
+def _fetch_prices_batch(providers=None):
+    """Multi-source API ile paralel veri çekimi.
+
+    Verilen sağlayıcılar (varsayılan: hepsi) aynı anda çağrılır, sonuçlar
+    geldikçe birleştirilir. Bu turda çağrılmayan ya da global deadline'ı
+    kaçıran sağlayıcının değeri bir önceki snapshot'tan taşınır.
+    Snapshot'taki "as_of" her alanın son canlı çekim zamanıdır; fallback
+    değerlerde None.
+    """
     try:
         prices = {k: None for k in PRICE_SYMBOLS.keys()}
-        
-        # === 1. KRİPTO (CoinGecko) ===
-        try:
-            crypto_response = requests.get(
-                'https://api.coingecko.com/api/v3/simple/price',
-                params={'ids': 'bitcoin', 'vs_currencies': 'usd'},
-                timeout=5,
-                headers={'User-Agent': 'Mozilla/5.0'}
-            )
-            if crypto_response.ok:
-                crypto_data = crypto_response.json()
-                prices['btc'] = _safe_float(crypto_data.get('bitcoin', {}).get('usd'))
-                print(f"✓ BTC: ${prices['btc']}")
-        except Exception as e:
-            print(f"CoinGecko error: {e}")
-        
-        # === 2. DÖVİZ (ExchangeRate-API) ===
+        as_of = {}
+        with _lock:
+            previous = _last_good["data"] or {}
+            previous_ts = _last_good["ts"]
+        previous_as_of = previous.get("as_of") or {}
+
+        pool = _price_pool()
+        # Deadline'ı kaçırıp hâlâ süren çağrının Session'ı thread-safe değil:
+        # o sağlayıcı bu turda atlanır, değeri önceki snapshot'tan taşınır
+        states = [st for st in (_provider_states if providers is None else providers) if not st.busy()]
+        futures = {}
+        for st in states:
+            st.pending = pool.submit(_timed_fetch, st.fn, _provider_session(st.name))
+            futures[st.pending] = st
         try:
-            fx_response = requests.get(
-                'https://api.exchangerate-api.com/v4/latest/USD',
-                timeout=5,
-                headers={'User-Agent': 'Mozilla/5.0'}
-            )
-            if fx_response.ok:
-                rates = fx_response.json().get('rates', {})
-                prices['usd_try'] = _safe_float(rates.get('TRY'))
-                
-                eur_rate = _safe_float(rates.get('EUR'))
-                if eur_rate and prices['usd_try']:
-                    prices['eur_try'] = prices['usd_try'] / eur_rate
-                
-                print(f"✓ USD/TRY: {prices['usd_try']}")
-                print(f"✓ EUR/TRY: {prices['eur_try']}")
-        except Exception as e:
-            print(f"ExchangeRate error: {e}")
-        
-        # === 3. ALTIN, GÜMÜŞ, BAKIR (Metals-API) ===
-        METALS_API_KEY = os.environ.get('METALS_API_KEY')
-        if METALS_API_KEY:
-            try:
-                metals_response = requests.get(
-                    f'https://metals-api.com/api/latest',
-                    params={
-                        'access_key': METALS_API_KEY,
-                        'base': 'USD',
-                        'symbols': 'XAU,XAG,XCU'
-                    },
-                    timeout=5
-                )
-                if metals_response.ok:
-                    metals_data = metals_response.json()
-                    if metals_data.get('success'):
-                        rates = metals_data.get('rates', {})
-                        if rates.get('XAU'):
-                            prices['gold'] = 1 / _safe_float(rates['XAU'])
-                        if rates.get('XAG'):
-                            prices['silver'] = 1 / _safe_float(rates['XAG'])
-                        if rates.get('XCU'):
-                            prices['copper'] = 1 / _safe_float(rates['XCU'])
-                        
-                        print(f"✓ Gold: ${prices['gold']}")
-                        print(f"✓ Silver: ${prices['silver']}")
-            except Exception as e:
-                print(f"Metals-API error: {e}")
-        
+            for fut in as_completed(futures, timeout=PRICE_REFRESH_DEADLINE_SECONDS):
+                st = futures[fut]
+                elapsed, part, error = fut.result()
+                price_telemetry.provider_latency[st.name].observe(elapsed)
+                if error is not None:
+                    print(f"{st.name} error: {error}")
+                    price_telemetry.provider_calls[(st.name, "error")] += 1
+                    st.record_failure(time.time())
+                    continue
+                price_telemetry.provider_calls[(st.name, "success")] += 1
+                st.record_success(time.time())
+                fetched_at = time.time()
+                for k, v in (part or {}).items():
+                    if v is not None:
+                        prices[k] = v
+                        as_of[k] = fetched_at
+        except FuturesTimeout:
+            late = [st for fut, st in futures.items() if not fut.done()]
+            print(f"⏱ Deadline aşıldı ({PRICE_REFRESH_DEADLINE_SECONDS}s), bekleyenler: {', '.join(st.name for st in late)}")
+            for st in late:
+                price_telemetry.provider_calls[(st.name, "timeout")] += 1
+                st.record_failure(time.time())
+
+        # Bu turda gelmeyen değerler için son iyi snapshot (fallback ise yine fallback sayılır)
+        for k in PRICE_SYMBOLS.keys():
+            if prices[k] is None and previous.get(k) is not None and not _is_fallback(previous, k):
+                prices[k] = previous[k]
+                as_of[k] = previous_as_of.get(k, previous_ts)
+
         # Fallback değerler
-        if not prices['gold']:
-            prices['gold'] = 2750.0
-        if not prices['silver']:
-            prices['silver'] = 31.5
-        if not prices['copper']:
-            prices['copper'] = 4.2
-        
-        if not METALS_API_KEY:
-            print("⚠ Metals-API key yok, fallback değerler kullanılıyor")
-        
-        # === 4. BIST 100 ===
-        try:
-            bist_response = requests.get(
-                'https://api.bigpara.hurriyet.com.tr/doviz/headerlist/anasayfa',
-                timeout=5,
-                headers={'User-Agent': 'Mozilla/5.0'}
-            )
-            if bist_response.ok:
-                bist_data = bist_response.json()
-                
-                # API bazen string dönüyor
-                if isinstance(bist_data, str):
-                    import json
-                    try:
-                        bist_data = json.loads(bist_data)
-                    except:
-                        bist_data = []
-                
-                if isinstance(bist_data, list):
-                    for item in bist_data:
-                        if isinstance(item, dict) and item.get('SEMBOL') == 'XU100':
-                            prices['bist100'] = _safe_float(item.get('KAPANIS'))
-                            print(f"✓ BIST100: {prices['bist100']}")
-                            break
-                
-                if not prices.get('bist100'):
-                    prices['bist100'] = 10850.0
-                    print(f"⚠ BIST100 fallback: {prices['bist100']}")
-        except Exception as e:
-            print(f"BIST100 error: {e}")
-            prices['bist100'] = 10850.0
-        
-        # === 5. GRAM ALTIN HESAPLA ===
+        for k, v in _FALLBACK_PRICES.items():
+            if not prices.get(k):
+                prices[k] = v
+                as_of.pop(k, None)
+                price_telemetry.fallbacks[k] += 1
+                print(f"⚠ {k} fallback: {v}")
+
+        # === GRAM ALTIN HESAPLA ===
         if prices.get('gold') and prices.get('usd_try'):
             prices['gram_altin'] = (prices['gold'] / 31.1035) * prices['usd_try']
+            if as_of.get('gold') and as_of.get('usd_try'):
+                as_of['gram_altin'] = min(as_of['gold'], as_of['usd_try'])
             print(f"✓ Gram Altın: ₺{prices['gram_altin']:.2f}")
         
+        prices['as_of'] = as_of
         prices['timestamp'] = datetime.now().isoformat()
         
         if any(v is not None for k, v in prices.items() if k != 'timestamp'):
@@ -342,31 +1038,404 @@ def _fetch_prices_batch():
         return None
 
 
+# ----------------------------
+# Price history (ring buffer + DB flush)
+# ----------------------------
+HISTORY_KEYS = tuple(PRICE_SYMBOLS.keys()) + ("gram_altin",)
+PRICE_HISTORY_CAPACITY = int(os.environ.get("PRICE_HISTORY_CAPACITY", "8640"))
+PRICE_HISTORY_FLUSH_SECONDS = 60
+PRICE_HISTORY_RETENTION_DAYS = 90
+HISTORY_RANGES = {
+    "1h": 3600,
+    "6h": 6 * 3600,
+    "1d": 86400,
+    "1w": 7 * 86400,
+    "1m": 30 * 86400,
+}
+
+
+class _PriceRing:
+    """Sabit boyutlu, array('d') tabanlı (ts, fiyat) ring buffer"""
+
+    __slots__ = ("ts", "px", "head", "size", "capacity")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = array("d", bytes(8 * capacity))
+        self.px = array("d", bytes(8 * capacity))
+        self.head = 0
+        self.size = 0
+
+    def append(self, ts: float, px: float):
+        self.ts[self.head] = ts
+        self.px[self.head] = px
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def oldest(self):
+        if not self.size:
+            return None
+        return self.ts[0] if self.size < self.capacity else self.ts[self.head]
+
+    def since(self, start_ts: float):
+        """start_ts'den itibaren kronolojik (ts, px) dizileri"""
+        if self.size < self.capacity:
+            ts, px = self.ts[:self.size], self.px[:self.size]
+        else:
+            ts = self.ts[self.head:] + self.ts[:self.head]
+            px = self.px[self.head:] + self.px[:self.head]
+        i = bisect_left(ts, start_ts)
+        return ts[i:], px[i:]
+
+
+_history = {k: _PriceRing(PRICE_HISTORY_CAPACITY) for k in HISTORY_KEYS}
+_history_lock = threading.Lock()
+_history_pending = []
+_history_last_ts = 0.0
+_history_last_flush = 0.0
+
+
+def _record_history(data: dict, ts: float, persist: bool = False):
+    """Yeni snapshot'ı ring buffer'lara ekler; lider ise DB'ye yazılacaklar kuyruğuna da."""
+    global _history_last_ts
+    with _history_lock:
+        if ts <= _history_last_ts:
+            return
+        _history_last_ts = ts
+        for k in HISTORY_KEYS:
+            v = data.get(k)
+            # Sabit fallback değer gerçek fiyat değil, geçmişe yazılmaz
+            if v is None or _is_fallback(data, k):
+                continue
+            _history[k].append(ts, v)
+            if persist:
+                _history_pending.append({"symbol_key": k, "ts": ts, "price": v})
+
+
+def _flush_history(force: bool = False):
+    global _history_last_flush
+    now_ts = time.time()
+    if not force and now_ts - _history_last_flush < PRICE_HISTORY_FLUSH_SECONDS:
+        return
+    _history_last_flush = now_ts
+
+    with _history_lock:
+        rows = _history_pending[:]
+        del _history_pending[:]
+    if not rows:
+        return
+
+    with app.app_context():
+        try:
+            db.session.execute(db.insert(PriceTick), rows)
+            cutoff = now_ts - PRICE_HISTORY_RETENTION_DAYS * 86400
+            db.session.query(PriceTick).filter(PriceTick.ts < cutoff).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"History flush error: {e}")
+
+
+def _lttb(ts, px, threshold: int):
+    """Largest-Triangle-Three-Buckets downsampling"""
+    n = len(ts)
+    if threshold >= n or threshold < 3:
+        return list(zip(ts, px))
+
+    out = [(ts[0], px[0])]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Sonraki bucket'ın ortalaması
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        span = avg_end - avg_start
+        avg_x = sum(ts[avg_start:avg_end]) / span
+        avg_y = sum(px[avg_start:avg_end]) / span
+
+        # Bu bucket'ta üçgen alanı en büyük nokta
+        rng_start = int(i * every) + 1
+        rng_end = int((i + 1) * every) + 1
+        ax, ay = ts[a], px[a]
+        max_area = -1.0
+        pick = rng_start
+        for j in range(rng_start, rng_end):
+            area = abs((ax - avg_x) * (px[j] - ay) - (ax - ts[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                pick = j
+        out.append((ts[pick], px[pick]))
+        a = pick
+
+    out.append((ts[-1], px[-1]))
+    return out
+
+
+def _history_from_db(symbol_key: str, start_ts: float, end_ts: float, max_rows: int):
+    """DB'deki tick'leri SQL tarafında kaba bucket'lara indirger (en fazla ~max_rows satır)"""
+    bucket = max(1.0, (end_ts - start_ts) / max_rows)
+    slot = db.cast(PriceTick.ts / bucket, db.Integer)
+    rows = (
+        db.session.query(db.func.min(PriceTick.ts), db.func.avg(PriceTick.price))
+        .filter(
+            PriceTick.symbol_key == symbol_key,
+            PriceTick.ts >= start_ts,
+            PriceTick.ts < end_ts,
+        )
+        .group_by(slot)
+        .order_by(db.func.min(PriceTick.ts))
+        .all()
+    )
+    return [r[0] for r in rows], [float(r[1]) for r in rows]
+
+
+# ----------------------------
+# Price alerts
+# ----------------------------
+ALERT_WINDOWS = {"1h": 3600, "1d": 86400}
+ALERT_THRESHOLDS_PCT = {"1h": 5.0, "1d": 20.0}
+# Histerezis: eşik aşıldıktan sonra |değişim| eşiğin bu oranının altına inmeden yeni alert yok
+ALERT_REARM_RATIO = 0.5
+# Pencerenin en az bu kadarı dolmadan (ör. restart sonrası) değerlendirme yapılmaz
+ALERT_MIN_COVERAGE = 0.9
+
+
+class _AlertWindow:
+    """Sembol + pencere için kayan baseline. Her tick amortized O(1):
+    deque'nun başı pencere başındaki (en son) fiyattır."""
+
+    __slots__ = ("span", "points", "armed")
+
+    def __init__(self, span: int):
+        self.span = span
+        self.points = deque()
+        self.armed = True
+
+    def push(self, ts: float, px: float):
+        self.points.append((ts, px))
+        cutoff = ts - self.span
+        while len(self.points) > 1 and self.points[1][0] <= cutoff:
+            self.points.popleft()
+
+    def change_pct(self):
+        base_ts, base_px = self.points[0]
+        ts, px = self.points[-1]
+        if not base_px or ts - base_ts < self.span * ALERT_MIN_COVERAGE:
+            return None
+        return (px - base_px) / base_px * 100.0
+
+
+_alert_windows = None
+
+
+def _seed_alert_windows(now_ts: float):
+    """Restart sonrası baseline'ları DB'deki tick'ler + ring buffer ile doldurur"""
+    global _alert_windows
+    _alert_windows = {
+        k: {w: _AlertWindow(span) for w, span in ALERT_WINDOWS.items()}
+        for k in PRICE_SYMBOLS.keys()
+    }
+    start_ts = now_ts - max(ALERT_WINDOWS.values())
+    last_ts = {}
+
+    with app.app_context():
+        rows = (
+            db.session.query(PriceTick.symbol_key, PriceTick.ts, PriceTick.price)
+            .filter(PriceTick.ts >= start_ts, PriceTick.symbol_key.in_(list(PRICE_SYMBOLS.keys())))
+            .order_by(PriceTick.ts)
+            .all()
+        )
+    for k, ts, px in rows:
+        for win in _alert_windows[k].values():
+            win.push(ts, px)
+        last_ts[k] = ts
+
+    with _history_lock:
+        for k, windows in _alert_windows.items():
+            ts_arr, px_arr = _history[k].since(last_ts.get(k, start_ts - 1) + 1e-3)
+            for ts, px in zip(ts_arr, px_arr):
+                for win in windows.values():
+                    win.push(ts, px)
+
+
 def _maybe_create_price_alerts_from_cache(cached_prices: dict):
-    """Cache üzerinden alert üretir"""
-    pass
+    """Cache üzerinden alert üretir (sadece fetcher lideri çağırır)"""
+    now_ts = time.time()
+    if _alert_windows is None:
+        _seed_alert_windows(now_ts)
+
+    fired = []
+    for k, windows in _alert_windows.items():
+        px = cached_prices.get(k)
+        if px is None or _is_fallback(cached_prices, k):
+            continue
+        for w, win in windows.items():
+            win.push(now_ts, px)
+            pct = win.change_pct()
+            if pct is None:
+                continue
+            threshold = ALERT_THRESHOLDS_PCT[w]
+            if win.armed and abs(pct) >= threshold:
+                win.armed = False
+                fired.append({"symbol_key": k, "change_pct": round(pct, 2), "window": w, "last_price": px})
+            elif not win.armed and abs(pct) < threshold * ALERT_REARM_RATIO:
+                win.armed = True
+
+    if not fired:
+        return
+
+    created = now_utc()
+    for row in fired:
+        row["created_at"] = created
+
+    with app.app_context():
+        try:
+            ids = db.session.scalars(
+                db.insert(PriceAlert).returning(PriceAlert.id, sort_by_parameter_order=True),
+                fired,
+            ).all()
+            db.session.execute(
+                db.insert(FeedEvent),
+                [
+                    {"type": "alert", "ref_id": i, "score": 1.0, "created_at": created,
+                     "hot": hot_rank(abs(row["change_pct"]), created)}
+                    for i, row in zip(ids, fired)
+                ],
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    bump_generations("feed")
+
+    for row in fired:
+        print(f"🚨 Alert: {row['symbol_key']} {row['window']} {row['change_pct']:+.2f}%")
+
+
+# ----------------------------
+# Shared price cache (gunicorn worker'ları arası)
+# ----------------------------
+# Worker'lardan yalnızca biri (flock'u tutan) upstream'e gider ve snapshot'ı
+# dosyaya yazar; diğerleri dosyanın mtime'ı değiştiğinde okur.
+PRICE_SHARED_DIR = os.environ.get("PRICE_SHARED_DIR") or tempfile.gettempdir()
+PRICE_SNAPSHOT_PATH = os.path.join(PRICE_SHARED_DIR, "financhatting-prices.json")
+PRICE_LEADER_LOCK_PATH = os.path.join(PRICE_SHARED_DIR, "financhatting-prices.lock")
+PRICE_FOLLOWER_POLL_SECONDS = 2
+
+_leader_fd = None
+_snapshot_mtime_ns = 0
+
+
+def _try_become_leader() -> bool:
+    """Fetcher seçimi: lock dosyasını alan süreç lider olur."""
+    global _leader_fd
+    if _leader_fd is not None:
+        return True
+    if fcntl is None:
+        # flock yoksa (Windows) her süreç kendi fetcher'ını çalıştırır
+        return True
+
+    fd = os.open(PRICE_LEADER_LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+
+    _leader_fd = fd
+    print(f"👑 Fiyat fetcher lideri: pid {os.getpid()}")
+    return True
+
+
+def _set_snapshot(data: dict, ts: float):
+    """_lock tutulurken çağrılır"""
+    global _price_version
+    previous = _last_good["data"] or {}
+    _last_good["data"] = data
+    _last_good["ts"] = ts
+    if any(previous.get(k) != data.get(k) for k in HISTORY_KEYS):
+        _price_version = int(ts * 1000)
+        _price_cond.notify_all()
+
+
+def _publish_snapshot(data: dict, ts: float):
+    with _price_cond:
+        _set_snapshot(data, ts)
+    _record_history(data, ts, persist=True)
+
+    tmp_path = f"{PRICE_SNAPSHOT_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"ts": ts, "data": data}, f)
+        os.replace(tmp_path, PRICE_SNAPSHOT_PATH)
+    except OSError as e:
+        print(f"Snapshot yazılamadı: {e}")
+
+
+def _load_shared_snapshot() -> bool:
+    """Paylaşılan snapshot değiştiyse yerel cache'e alır; dosya aynıysa sadece stat maliyeti."""
+    global _snapshot_mtime_ns
+    try:
+        mtime_ns = os.stat(PRICE_SNAPSHOT_PATH).st_mtime_ns
+    except OSError:
+        return False
+    if mtime_ns == _snapshot_mtime_ns:
+        return False
+
+    try:
+        with open(PRICE_SNAPSHOT_PATH, encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    _snapshot_mtime_ns = mtime_ns
+    with _price_cond:
+        if payload.get("ts", 0.0) <= _last_good["ts"] or not payload.get("data"):
+            return False
+        _set_snapshot(payload["data"], payload["ts"])
+    _record_history(payload.get("data") or {}, payload.get("ts", 0.0))
+    return True
 
 
 def _bg_loop():
     """Arka planda sürekli çalışan thread"""
+    was_leader = False
     while True:
-        print(f"🔄 [{datetime.now().strftime('%H:%M:%S')}] Fiyatlar çekiliyor...")
-        data = _fetch_prices_batch()
-        
-        if data:
-            with _lock:
-                _last_good["data"] = data
-                _last_good["ts"] = time.time()
-            print(f"✅ Cache güncellendi")
-            
-            try:
-                _maybe_create_price_alerts_from_cache(data)
-            except Exception as e:
-                print(f"Alert bg error: {e}")
-        else:
-            print(f"⚠ Veri çekilemedi, cache korunuyor")
-
-        time.sleep(max(10, CACHE_TTL_SECONDS))
+        if not _try_become_leader():
+            _load_shared_snapshot()
+            time.sleep(PRICE_FOLLOWER_POLL_SECONDS)
+            continue
+
+        if not was_leader:
+            # Önceki liderin son snapshot'ından devam et
+            _load_shared_snapshot()
+            was_leader = True
+
+        due = [st for st in _provider_states if st.due(time.time())]
+        if due:
+            print(f"🔄 [{datetime.now().strftime('%H:%M:%S')}] Fiyatlar çekiliyor: {', '.join(st.name for st in due)}")
+            started = time.perf_counter()
+            data = _fetch_prices_batch(due)
+
+            if data:
+                _publish_snapshot(data, time.time())
+                price_telemetry.refreshes["published"] += 1
+                price_telemetry.refresh.observe(time.perf_counter() - started)
+                print(f"✅ Cache güncellendi")
+
+                try:
+                    _maybe_create_price_alerts_from_cache(data)
+                except Exception as e:
+                    print(f"Alert bg error: {e}")
+            else:
+                price_telemetry.refreshes["empty"] += 1
+                print(f"⚠ Veri çekilemedi, cache korunuyor")
+
+        _flush_history()
+
+        # Bir sonraki vadesi gelen sağlayıcıya kadar uyu
+        wait = min(st.next_due for st in _provider_states) - time.time()
+        time.sleep(min(max(1.0, wait), 30.0))
 
 
 def _ensure_bg_started():
@@ -383,89 +1452,1186 @@ def get_financial_data():
     """ASLA BLOKLAMAZ"""
     _ensure_bg_started()
 
-    now_ts = time.time()
-    with _lock:
-        cached = _last_good["data"]
-        age = now_ts - _last_good["ts"]
+    if _last_good["data"] is None:
+        # Yeni başlayan worker: lider zaten yazmış olabilir
+        _load_shared_snapshot()
+
+    now_ts = time.time()
+    with _lock:
+        cached = _last_good["data"]
+        age = now_ts - _last_good["ts"]
+
+    if cached:
+        if age < CACHE_TTL_SECONDS:
+            return cached
+        else:
+            return cached
+
+    return _placeholder_prices()
+
+
+# ----------------------------
+# Generation counters (ETag / invalidation)
+# ----------------------------
+# Yazmalar ilgili sayacı artırır; okumalar mmap'ten tek bellek okuması yapar.
+# Slot 0 dosya oluşturulurken rastgele bir epoch alır: dosya silinip yeniden
+# oluşursa eski ETag'ler tekrar eşleşmez.
+# "comments:<sembol>" slotları yorum yazmalarının yalnız o sembolün önbelleğini
+# düşürmesi için; genel "comments" profil değişikliği gibi tümünü etkileyenler için
+# "search" arama sonuçlarının içeriğini (metin, yazar, rating) değiştiren her yazmada
+# artar; yeni slotlar sona eklenir ki mevcut dosyadaki sayaçlar kaymasın
+GENERATION_NAMES = ("feed", "explore", "comments") + tuple(f"comments:{k}" for k in PRICE_SYMBOLS) + ("search",)
+GENERATIONS_PATH = os.path.join(PRICE_SHARED_DIR, "financhatting-generations.bin")
+
+
+class _Generations:
+    def __init__(self, path: str, names):
+        self.path = path
+        self.slots = {name: i + 1 for i, name in enumerate(names)}
+        self.size = 8 * (len(names) + 1)
+        self._fd = None
+        self._mm = None
+        self._pid = None
+        self._error_pid = None
+        self._local_lock = threading.RLock()
+
+    def _map(self):
+        """Süreç başına mmap; açılamazsa None (hata süreç başına bir kez loglanır)"""
+        if self._pid != os.getpid():
+            with self._local_lock:
+                if self._pid != os.getpid():
+                    fd = None
+                    try:
+                        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                        with self._locked(fd):
+                            if os.fstat(fd).st_size < self.size:
+                                os.ftruncate(fd, self.size)
+                            mm = mmap.mmap(fd, self.size)
+                            if struct.unpack_from("<Q", mm, 0)[0] == 0:
+                                struct.pack_into("<Q", mm, 0, random.getrandbits(63) | 1)
+                    except OSError as e:
+                        if fd is not None:
+                            os.close(fd)
+                        if self._error_pid != os.getpid():
+                            self._error_pid = os.getpid()
+                            print(f"⚠️ Generation dosyası açılamadı ({self.path}): {e}; ETag ve result cache kapalı")
+                        return None
+                    self._fd, self._mm, self._pid = fd, mm, os.getpid()
+        return self._mm
+
+    @contextmanager
+    def _locked(self, fd):
+        with self._local_lock:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def read(self, names):
+        """(epoch, sayaç...) ya da dosya kullanılamıyorsa None"""
+        mm = self._map()
+        if mm is None:
+            return None
+        return (struct.unpack_from("<Q", mm, 0)[0],) + tuple(
+            struct.unpack_from("<Q", mm, 8 * self.slots[n])[0] for n in names
+        )
+
+    def bump(self, *names):
+        mm = self._map()
+        if mm is None:
+            return  # okumalar da cache/ETag kullanmıyor, geçersizlenecek bir şey yok
+        with self._locked(self._fd):
+            for name in names:
+                off = 8 * self.slots[name]
+                struct.pack_into("<Q", mm, off, struct.unpack_from("<Q", mm, off)[0] + 1)
+
+
+generations = _Generations(GENERATIONS_PATH, GENERATION_NAMES)
+
+
+def bump_generations(*names):
+    try:
+        generations.bump(*names)
+    except OSError as e:
+        print(f"Generation bump error: {e}")
+
+
+def generation_etag(*names, suffix: str = ""):
+    """Sayaçlardan ETag; generation dosyası kullanılamıyorsa None (ETag yok)"""
+    stamp = generations.read(names)
+    if stamp is None:
+        return None
+    etag = f"g{stamp[0]:x}-" + "-".join(str(v) for v in stamp[1:]) + suffix
+    if read_from_replica():
+        # Replika yanıtı gecikmeli olabilir; ETag en geç REPLICA_LAG_SECONDS'ta değişsin
+        etag += f"-r{int(time.time()) // REPLICA_LAG_SECONDS}"
+    return etag
+
+
+def not_modified(etag):
+    """If-None-Match eşleşirse DB'ye/JSON encoder'a dokunmadan 304"""
+    if etag and request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+    return None
+
+
+def with_etag(resp, etag):
+    if not etag:
+        return resp
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+# ----------------------------
+# Result cache (LRU + TTL, generation tag'leriyle geçersizlenir)
+# ----------------------------
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+
+
+class _ResultCache:
+    """Worker içi sınırlı LRU. Her kayıt üretildiği andaki tag sayaçlarını
+    saklar; okumada sayaçlar mmap'ten okunup karşılaştırılır, böylece hangi
+    worker'da yazılırsa yazılsın ilgili kayıtlar tüm worker'larda düşer."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, tags, compute, ttl=None):
+        stamp = generations.read(tags)
+        if stamp is None:
+            return compute()  # geçersizleme yok: cache'i atla
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now and entry[1] == stamp:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        # Hesaplama kilit dışında: yavaş sorgu diğer anahtarları bekletmesin
+        value = compute()
+        with self._lock:
+            self._data[key] = (now + (self.ttl if ttl is None else ttl), stamp, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+result_cache = _ResultCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_SECONDS)
+
+
+def cached_result(key, tags, compute):
+    if RESULT_CACHE_MAX_ENTRIES <= 0:
+        return compute()
+    if read_from_replica():
+        # Gecikmeli replikadan gelen sonuç yeni generation'la damgalanabilir:
+        # ayrı anahtar (primary okuyucularına sızmasın) ve kısa ömür
+        return result_cache.get_or_compute(("replica",) + tuple(key), tuple(tags), compute, REPLICA_LAG_SECONDS)
+    return result_cache.get_or_compute(key, tuple(tags), compute)
+
+
+# ----------------------------
+# Rating summaries
+# ----------------------------
+def rating_summary(rating_sum, rating_count):
+    cnt = int(rating_count or 0)
+    avg = float(rating_sum) / cnt if cnt else 0.0
+    return avg, cnt
+
+
+def top_score_expr(rating_sum, rating_count):
+    """SQL tarafında avg * (1 + cnt/5) = sum/cnt + sum/5"""
+    total = db.cast(rating_sum, db.Float)
+    return db.case((rating_count > 0, total / rating_count + total / 5.0), else_=0.0)
+
+
+HOT_EPOCH = 1735689600  # 2025-01-01 UTC
+HOT_DECAY_SECONDS = 45000  # 12.5 saat yenilik = 10 kat ağırlık
+HOT_SCORE_THRESHOLD = 10.0
+
+
+def hot_rank(weight: float, created_at) -> float:
+    """Kalite ve yeniliği tek monoton değerde birleştirir.
+
+    Yazıldıktan sonra yalnız ağırlık değişince güncellenir; eski içerik
+    periyodik yeniden yazma olmadan yeni içeriğin altında kalır.
+    """
+    age = _as_utc(created_at).timestamp() - HOT_EPOCH
+    return round(math.log10(max(weight, 1.0)) + age / HOT_DECAY_SECONDS, 7)
+
+
+def post_feed_score(avg: float, cnt: int) -> float:
+    return float(avg) * (1.0 + (cnt / 10.0))
+
+
+def refresh_post_rank(post_id: int, row):
+    """Post rating'i değişince feed event'in score/hot/is_hot alanlarını günceller.
+    row: apply_post_rating'in döndürdüğü (rating_sum, rating_count, created_at).
+    (avg, cnt) döner."""
+    avg, cnt = rating_summary(row.rating_sum, row.rating_count)
+    score = post_feed_score(avg, cnt)
+    db.session.query(FeedEvent).filter(FeedEvent.type == "post", FeedEvent.ref_id == post_id).update(
+        {
+            FeedEvent.score: score,
+            FeedEvent.hot: hot_rank(row.rating_sum, row.created_at),
+            FeedEvent.is_hot: score > HOT_SCORE_THRESHOLD,
+        },
+        synchronize_session=False,
+    )
+    return avg, cnt
+
+
+def refresh_post_ranks(post_ids):
+    """refresh_post_rank'ın toplu hali: {post_id: (avg, cnt)}"""
+    rows = (
+        db.session.query(Post.id, Post.rating_sum, Post.rating_count, Post.created_at)
+        .filter(Post.id.in_(list(post_ids)))
+        .all()
+    )
+    out, params = {}, []
+    for row in rows:
+        avg, cnt = rating_summary(row.rating_sum, row.rating_count)
+        score = post_feed_score(avg, cnt)
+        out[row.id] = (avg, cnt)
+        params.append({"b_ref": row.id, "b_score": score, "b_hot": hot_rank(row.rating_sum, row.created_at),
+                       "b_is_hot": score > HOT_SCORE_THRESHOLD})
+    if params:
+        t = FeedEvent.__table__
+        db.session.execute(
+            db.update(t)
+            .where(t.c.type == "post", t.c.ref_id == db.bindparam("b_ref"))
+            .values(score=db.bindparam("b_score"), hot=db.bindparam("b_hot"), is_hot=db.bindparam("b_is_hot")),
+            params,
+        )
+    return out
+
+
+def rebuild_feed_ranks(batch_size: int = 1000):
+    """Tüm feed event'lerin score/hot/is_hot alanlarını kaynak satırlardan yeniden hesaplar"""
+    last_id = 0
+    while True:
+        events = (
+            db.session.query(FeedEvent.id, FeedEvent.type, FeedEvent.ref_id, FeedEvent.created_at)
+            .filter(FeedEvent.id > last_id)
+            .order_by(FeedEvent.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not events:
+            break
+        last_id = events[-1].id
+
+        posts = _by_id(Post, [e.ref_id for e in events if e.type == "post"])
+        alerts = _by_id(PriceAlert, [e.ref_id for e in events if e.type == "alert"])
+        rows = []
+        for e in events:
+            if e.type == "post" and e.ref_id in posts:
+                p = posts[e.ref_id]
+                avg, cnt = rating_summary(p.rating_sum, p.rating_count)
+                score = post_feed_score(avg, cnt)
+                rows.append({"id": e.id, "score": score, "hot": hot_rank(p.rating_sum, p.created_at),
+                             "is_hot": score > HOT_SCORE_THRESHOLD})
+            elif e.type == "alert" and e.ref_id in alerts:
+                a = alerts[e.ref_id]
+                rows.append({"id": e.id, "score": 1.0, "hot": hot_rank(abs(a.change_pct), e.created_at),
+                             "is_hot": False})
+        if rows:
+            db.session.execute(db.update(FeedEvent), rows)
+        db.session.commit()
+
+
+@app.cli.command("rebuild-feed-ranks")
+def rebuild_feed_ranks_command():
+    """Feed sıralama skorlarını yeniden hesapla"""
+    rebuild_feed_ranks()
+    print("✅ Feed skorları yeniden hesaplandı")
+
+
+def _dialect_insert():
+    """ON CONFLICT destekleyen insert() (PostgreSQL/SQLite); diğerlerinde None"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def _upsert_ratings(model, ref_col, user_id: int, stars_by_ref: dict):
+    """Bir kullanıcının rating'lerini tek INSERT ... ON CONFLICT DO UPDATE ile yazar.
+
+    DO UPDATE içinde eski satırın stars değeri prev_stars'a kopyalanır ve
+    RETURNING ile geri okunur: yeni kayıtta None, güncellemede önceki yıldız.
+    Çakışan satır kilitli okunduğu için eşzamanlı iki tıklama da doğru delta verir.
+    {ref_id: prev_stars} döner.
+    """
+    insert = _dialect_insert()
+    if insert is None:
+        prev = {}
+        for ref_id, stars in stars_by_ref.items():
+            r = db.session.query(model).filter(ref_col == ref_id, model.user_id == user_id).with_for_update().first()
+            if r:
+                prev[ref_id], r.stars = r.stars, stars
+            else:
+                prev[ref_id] = None
+                db.session.add(model(**{ref_col.key: ref_id, "user_id": user_id, "stars": stars}))
+        return prev
+
+    stmt = insert(model).values(
+        [{ref_col.key: ref_id, "user_id": user_id, "stars": stars} for ref_id, stars in stars_by_ref.items()]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ref_col.key, "user_id"],
+        set_={"prev_stars": model.__table__.c.stars, "stars": stmt.excluded.stars},
+    ).returning(ref_col, model.prev_stars)
+    return {ref_id: prev for ref_id, prev in db.session.execute(stmt)}
+
+
+def _upsert_rating(model, ref_col, ref_id: int, user_id: int, stars: int):
+    return _upsert_ratings(model, ref_col, user_id, {ref_id: stars})[ref_id]
+
+
+def _apply_rating(model, rating_model, ref_col, ref_id, user_id, stars, extra_values, returning):
+    try:
+        prev = _upsert_rating(rating_model, ref_col, ref_id, user_id, stars)
+    except IntegrityError:
+        # FK ihlali: hedef satır yok (PostgreSQL)
+        db.session.rollback()
+        return None
+
+    new_sum = model.rating_sum + (stars - (prev or 0))
+    new_cnt = model.rating_count + (0 if prev is not None else 1)
+    row = db.session.execute(
+        db.update(model)
+        .where(model.id == ref_id)
+        .values(rating_sum=new_sum, rating_count=new_cnt, **extra_values(new_sum, new_cnt))
+        .returning(model.rating_sum, model.rating_count, *returning)
+    ).first()
+    if row is None:
+        # Hedef yok (SQLite FK zorlamaz): yazılan rating'i geri al
+        db.session.rollback()
+    return row
+
+
+def apply_post_rating(post_id: int, user_id: int, stars: int):
+    """Rating upsert + posts aggregate güncellemesi, iki statement.
+
+    (rating_sum, rating_count, created_at) döner; post yoksa transaction geri
+    alınır ve None döner. Commit çağırana ait."""
+    return _apply_rating(
+        Post, PostRating, PostRating.post_id, post_id, user_id, stars,
+        lambda s, c: {"top_score": top_score_expr(s, c)},
+        (Post.created_at,),
+    )
+
+
+def apply_comment_rating(comment_id: int, user_id: int, stars: int):
+    """apply_post_rating'in yorum karşılığı: (rating_sum, rating_count, symbol_key) | None"""
+    return _apply_rating(
+        SymbolComment, CommentRating, CommentRating.comment_id, comment_id, user_id, stars,
+        lambda s, c: {},
+        (SymbolComment.symbol_key,),
+    )
+
+
+def apply_ratings_bulk(model, rating_model, ref_col, user_id: int, stars_by_ref: dict):
+    """Toplu rating: tek upsert + aggregate'ler için tek executemany UPDATE.
+    Hedeflerin var olduğunu çağıran doğrular; commit çağırana ait."""
+    prev = _upsert_ratings(rating_model, ref_col, user_id, stars_by_ref)
+    t = model.__table__
+    new_sum = t.c.rating_sum + db.bindparam("b_sum")
+    new_cnt = t.c.rating_count + db.bindparam("b_cnt")
+    values = {"rating_sum": new_sum, "rating_count": new_cnt}
+    if model is Post:
+        values["top_score"] = top_score_expr(new_sum, new_cnt)
+    db.session.execute(
+        db.update(t).where(t.c.id == db.bindparam("b_id")).values(values),
+        [
+            {"b_id": ref_id, "b_sum": stars - (prev[ref_id] or 0), "b_cnt": 0 if prev[ref_id] is not None else 1}
+            for ref_id, stars in stars_by_ref.items()
+        ],
+    )
+
+
+def rebuild_rating_aggregates():
+    """Denormalize rating kolonlarını rating tablolarından toplu yeniden hesaplar (reconciliation)"""
+    for model, rating_model, fk in (
+        (Post, PostRating, PostRating.post_id),
+        (SymbolComment, CommentRating, CommentRating.comment_id),
+    ):
+        sum_q = db.select(db.func.coalesce(db.func.sum(rating_model.stars), 0)).where(fk == model.id).scalar_subquery()
+        cnt_q = db.select(db.func.count(rating_model.id)).where(fk == model.id).scalar_subquery()
+        db.session.execute(db.update(model).values(rating_sum=sum_q, rating_count=cnt_q))
+    db.session.execute(db.update(Post).values(top_score=top_score_expr(Post.rating_sum, Post.rating_count)))
+    db.session.commit()
+
+
+@app.cli.command("rebuild-ratings")
+def rebuild_ratings_command():
+    """Rating aggregate kolonlarını yeniden hesapla"""
+    rebuild_rating_aggregates()
+    print("✅ Rating aggregate'leri yeniden hesaplandı")
+
+
+def top_posts_by_rating(limit=10):
+    """Leaderboard: ix_posts_top_score üzerinden K satır + yazarlar tek sorguda"""
+    posts = (
+        db.session.query(Post)
+        .order_by(Post.top_score.desc(), Post.id.desc())
+        .limit(limit)
+        .all()
+    )
+    users = users_by_id(p.user_id for p in posts)
+    out = []
+    for p in posts:
+        avg, cnt = rating_summary(p.rating_sum, p.rating_count)
+        out.append({"post": p, "user": users.get(p.user_id), "avg": avg, "cnt": cnt})
+    return out
+
+
+TREND_HALF_LIFE_HOURS = 12
+TREND_DECAY_PER_SECOND = math.log(2) / (TREND_HALF_LIFE_HOURS * 3600)
+TREND_WINDOW_HOURS = 7 * 24
+
+
+def _increment_or_insert(update_stmt, model, row: dict, conflict_cols):
+    """UPDATE ile artır; satır yoksa ekle (yarışta kaybedersek tekrar UPDATE).
+
+    Ekleme ON CONFLICT DO NOTHING ile çağıranın transaction'ında kalır;
+    pysqlite'ta SAVEPOINT transaction'ı başlatıp RELEASE'te tek başına commit
+    edebildiği için begin_nested yalnız diğer dialect'lerde."""
+    if db.session.execute(update_stmt).rowcount:
+        return
+    insert = _dialect_insert()
+    if insert is not None:
+        inserted = db.session.execute(insert(model).values(**row).on_conflict_do_nothing(index_elements=conflict_cols))
+        if inserted.rowcount != 1:
+            db.session.execute(update_stmt)
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(model(**row))
+    except IntegrityError:
+        db.session.execute(update_stmt)
+
+
+def record_symbol_comment(symbol_key: str, ts: float = None):
+    """Yorum yazma yolunda çağrılır: saatlik bucket + decay'li skor, ikisi de atomik artış"""
+    ts = ts or time.time()
+    bucket = int(ts // 3600)
+    _increment_or_insert(
+        db.update(SymbolActivity)
+        .where(SymbolActivity.symbol_key == symbol_key, SymbolActivity.bucket == bucket)
+        .values(cnt=SymbolActivity.cnt + 1),
+        SymbolActivity,
+        {"symbol_key": symbol_key, "bucket": bucket, "cnt": 1},
+        ["symbol_key", "bucket"],
+    )
+    _increment_or_insert(
+        db.update(SymbolTrend)
+        .where(SymbolTrend.symbol_key == symbol_key)
+        .values(
+            score=SymbolTrend.score * db.func.exp(-TREND_DECAY_PER_SECOND * (ts - SymbolTrend.updated_at)) + 1.0,
+            updated_at=ts,
+        ),
+        SymbolTrend,
+        {"symbol_key": symbol_key, "score": 1.0, "updated_at": ts},
+        ["symbol_key"],
+    )
+
+
+def trending_symbols_by_comments(limit=10):
+    """Decay'li skora göre trend semboller; maliyet sembol sayısıyla orantılı"""
+    now_ts = time.time()
+    current = int(now_ts // 3600)
+
+    counts = {}
+    rows = (
+        db.session.query(SymbolActivity.symbol_key, SymbolActivity.bucket, SymbolActivity.cnt)
+        .filter(SymbolActivity.bucket > current - TREND_WINDOW_HOURS)
+        .all()
+    )
+    for key, bucket, cnt in rows:
+        c = counts.setdefault(key, {"1h": 0, "24h": 0, "7d": 0})
+        c["7d"] += cnt
+        if bucket > current - 24:
+            c["24h"] += cnt
+        if bucket == current:
+            c["1h"] += cnt
+
+    scored = []
+    for t in db.session.query(SymbolTrend).all():
+        score = t.score * math.exp(-TREND_DECAY_PER_SECOND * (now_ts - t.updated_at))
+        c = counts.get(t.symbol_key)
+        if c:
+            scored.append((score, t.symbol_key, c))
+    scored.sort(key=lambda x: x[0], reverse=True)
+
+    return [
+        {"symbol_key": key, "cnt": c["7d"], "cnt_1h": c["1h"], "cnt_24h": c["24h"], "score": round(score, 3)}
+        for score, key, c in scored[:limit]
+    ]
+
+
+def rebuild_symbol_trends():
+    """Sayaçları son 7 günün yorumlarından sıfırdan kurar (ara sıra çalışan rebuild)"""
+    now_ts = time.time()
+    since = datetime.fromtimestamp(now_ts - TREND_WINDOW_HOURS * 3600, tz=timezone.utc)
+    buckets = {}
+    scores = {}
+    rows = (
+        db.session.query(SymbolComment.symbol_key, SymbolComment.created_at)
+        .filter(SymbolComment.created_at >= since)
+        .yield_per(1000)
+    )
+    for key, created_at in rows:
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        ts = created_at.timestamp()
+        bucket = int(ts // 3600)
+        buckets[(key, bucket)] = buckets.get((key, bucket), 0) + 1
+        scores[key] = scores.get(key, 0.0) + math.exp(-TREND_DECAY_PER_SECOND * (now_ts - ts))
+
+    db.session.query(SymbolActivity).delete(synchronize_session=False)
+    db.session.query(SymbolTrend).delete(synchronize_session=False)
+    if buckets:
+        db.session.execute(
+            db.insert(SymbolActivity),
+            [{"symbol_key": k, "bucket": b, "cnt": n} for (k, b), n in buckets.items()],
+        )
+    if scores:
+        db.session.execute(
+            db.insert(SymbolTrend),
+            [{"symbol_key": k, "score": s, "updated_at": now_ts} for k, s in scores.items()],
+        )
+    db.session.commit()
+
+
+@app.cli.command("rebuild-trends")
+def rebuild_trends_command():
+    """Trend sayaçlarını yorumlardan yeniden kur"""
+    rebuild_symbol_trends()
+    print("✅ Trend sayaçları yeniden kuruldu")
+
+
+# ----------------------------
+# Follow graph
+# ----------------------------
+def _bump_follow_counts(follower_id: int, following_id: int, delta: int) -> int:
+    """Sayaçları günceller; takip edilenin yeni followers_count değerini döner"""
+    followers = db.session.execute(
+        db.update(User)
+        .where(User.id == following_id)
+        .values(followers_count=User.followers_count + delta)
+        .returning(User.followers_count)
+    ).scalar()
+    db.session.execute(
+        db.update(User).where(User.id == follower_id).values(following_count=User.following_count + delta)
+    )
+    return followers
+
+
+def follow_pair(follower_id: int, following_id: int) -> bool:
+    """Takip ilişkisini ekler, sayaçları aynı transaction'da +1 yapar.
+    Zaten takip ediliyorsa (eşzamanlı istek dahil) False döner."""
+    insert = _dialect_insert()
+    if insert is not None:
+        # Savepoint'siz, sayaçlarla aynı transaction (bkz. _increment_or_insert)
+        stmt = insert(Follow).values(follower_id=follower_id, following_id=following_id)
+        if db.session.execute(stmt.on_conflict_do_nothing(index_elements=["follower_id", "following_id"])).rowcount != 1:
+            return False
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.add(Follow(follower_id=follower_id, following_id=following_id))
+        except IntegrityError:
+            return False
+    _bump_follow_counts(follower_id, following_id, 1)
+    return True
+
+
+def unfollow_pair(follower_id: int, following_id: int) -> bool:
+    deleted = db.session.query(Follow).filter(
+        Follow.follower_id == follower_id,
+        Follow.following_id == following_id,
+    ).delete(synchronize_session=False)
+    if not deleted:
+        return False
+    if _bump_follow_counts(follower_id, following_id, -1) == TIMELINE_FANOUT_LIMIT:
+        # Yazar pull'dan fan-out'a döndü: eşik üstündeyken yazdığı postlar
+        # hiçbir inbox'ta yok, pull yolu da artık onları getirmez
+        backfill_author_followers(following_id)
+    return True
+
+
+def following_ids(viewer_id, user_ids) -> set:
+    """viewer'ın verilen kullanıcılardan hangilerini takip ettiği (tek sorgu)"""
+    user_ids = list(set(user_ids))
+    if not viewer_id or not user_ids:
+        return set()
+    rows = (
+        db.session.query(Follow.following_id)
+        .filter(Follow.follower_id == viewer_id, Follow.following_id.in_(user_ids))
+        .all()
+    )
+    return {r[0] for r in rows}
+
+
+def rebuild_follow_counts():
+    """followers_count / following_count kolonlarını follows tablosundan yeniden hesaplar"""
+    followers = (
+        db.select(db.func.count(Follow.id)).where(Follow.following_id == User.id).scalar_subquery()
+    )
+    following = (
+        db.select(db.func.count(Follow.id)).where(Follow.follower_id == User.id).scalar_subquery()
+    )
+    db.session.execute(db.update(User).values(followers_count=followers, following_count=following))
+    db.session.commit()
+
+
+@app.cli.command("rebuild-follow-counts")
+def rebuild_follow_counts_command():
+    """Takipçi/takip sayaçlarını follows tablosundan yeniden kur"""
+    rebuild_follow_counts()
+    print("✅ Takip sayaçları yeniden kuruldu")
+
+
+# ----------------------------
+# Following timeline (hybrid fan-out)
+# ----------------------------
+# Bu sayının üstünde takipçisi olan yazarların postları inbox'lara yazılmaz;
+# okuma sırasında takipçinin akışına birleştirilir (pull)
+TIMELINE_FANOUT_LIMIT = int(os.getenv("TIMELINE_FANOUT_LIMIT", "5000"))
+# Yeni takipte hedefin son kaç postu inbox'a taşınsın
+TIMELINE_BACKFILL = int(os.getenv("TIMELINE_BACKFILL", "50"))
+
+
+def is_pull_author(user_id: int) -> bool:
+    count = db.session.query(User.followers_count).filter(User.id == user_id).scalar() or 0
+    return count > TIMELINE_FANOUT_LIMIT
+
+
+def pull_author_ids(viewer_id: int):
+    """viewer'ın takip ettiği, fan-out yapılmayan (çok takipçili) yazarlar"""
+    rows = (
+        db.session.query(Follow.following_id)
+        .join(User, User.id == Follow.following_id)
+        .filter(Follow.follower_id == viewer_id, User.followers_count > TIMELINE_FANOUT_LIMIT)
+        .all()
+    )
+    return [r[0] for r in rows]
+
+
+def fanout_post(post):
+    fanout_posts(post.user_id, [post.id])
+
+
+def fanout_posts(author_id: int, post_ids):
+    """Postları yazarın kendi inbox'ına ve (limit altındaysa) tüm takipçilerine
+    INSERT ... SELECT ile yazar; post sayısından bağımsız en fazla iki statement.
+    Postlar flush edilmiş olmalı, commit çağırana aittir."""
+    cols = ["user_id", "post_id", "author_id", "created_at"]
+    posts = db.select(Post.id, Post.user_id, Post.created_at).where(Post.id.in_(list(post_ids))).subquery()
+    db.session.execute(
+        db.insert(TimelineEntry).from_select(cols, db.select(posts.c.user_id, posts.c.id, posts.c.user_id, posts.c.created_at))
+    )
+    if is_pull_author(author_id):
+        return
+    db.session.execute(
+        db.insert(TimelineEntry).from_select(
+            cols,
+            db.select(Follow.follower_id, posts.c.id, posts.c.user_id, posts.c.created_at)
+            .join(posts, posts.c.user_id == Follow.following_id),
+        )
+    )
+
+
+def backfill_timeline(follower_id: int, author_id: int):
+    """Yeni takipte yazarın son postlarını inbox'a taşır (pull yazarlar hariç)"""
+    if is_pull_author(author_id):
+        return
+    recent = (
+        db.select(
+            db.literal(follower_id, db.BigInteger),
+            Post.id,
+            Post.user_id,
+            Post.created_at,
+        )
+        .where(Post.user_id == author_id)
+        .where(~db.exists().where(TimelineEntry.user_id == follower_id, TimelineEntry.post_id == Post.id))
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(TIMELINE_BACKFILL)
+    )
+    db.session.execute(
+        db.insert(TimelineEntry).from_select(["user_id", "post_id", "author_id", "created_at"], recent)
+    )
+
+
+def backfill_author_followers(author_id: int):
+    """Yazarın son postlarını tüm takipçilerinin inbox'ına taşır (eksik olanları);
+    yazar takipçi eşiğinin altına indiğinde tek INSERT ... SELECT ile çalışır"""
+    recent = (
+        db.select(Post.id, Post.user_id, Post.created_at)
+        .where(Post.user_id == author_id)
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(TIMELINE_BACKFILL)
+        .subquery()
+    )
+    db.session.execute(
+        db.insert(TimelineEntry).from_select(
+            ["user_id", "post_id", "author_id", "created_at"],
+            db.select(Follow.follower_id, recent.c.id, recent.c.user_id, recent.c.created_at)
+            .join(recent, recent.c.user_id == Follow.following_id)
+            .where(~db.exists().where(TimelineEntry.user_id == Follow.follower_id, TimelineEntry.post_id == recent.c.id)),
+        )
+    )
+
+
+def drop_timeline_author(follower_id: int, author_id: int):
+    db.session.query(TimelineEntry).filter(
+        TimelineEntry.user_id == follower_id,
+        TimelineEntry.author_id == author_id,
+    ).delete(synchronize_session=False)
+
+
+def timeline_page(viewer_id: int, cursor, limit: int):
+    """Takip akışı sayfası: (posts, next_cursor).
+
+    Inbox tek index aralığı olarak okunur; çok takipçili yazarların postları
+    aynı cursor ile ayrıca çekilip (created_at, id) sırasında birleştirilir.
+    """
+    entries, _ = keyset_page(
+        db.session.query(TimelineEntry).filter(TimelineEntry.user_id == viewer_id),
+        (TimelineEntry.created_at, TimelineEntry.post_id),
+        cursor,
+        limit + 1,
+    )
+    keys = [(e.created_at, e.post_id) for e in entries]
+
+    pulled = pull_author_ids(viewer_id)
+    if pulled:
+        posts, _ = keyset_page(
+            db.session.query(Post).filter(Post.user_id.in_(pulled)),
+            (Post.created_at, Post.id),
+            cursor,
+            limit + 1,
+        )
+        keys += [(p.created_at, p.id) for p in posts]
+
+    # Yazar eşik değerini sonradan aştıysa aynı post iki kaynaktan da gelebilir
+    seen = set()
+    merged = []
+    for ts, pid in sorted(keys, key=lambda k: (_as_utc(k[0]), k[1]), reverse=True):
+        if pid not in seen:
+            seen.add(pid)
+            merged.append((ts, pid))
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    posts = _by_id(Post, [pid for _, pid in merged])
+    next_cursor = encode_cursor(merged[-1]) if has_more else None
+    return [posts[pid] for _, pid in merged if pid in posts], next_cursor
+
+
+def _as_utc(dt):
+    # SQLite tz bilgisini saklamaz; karşılaştırmada naive değerleri UTC say
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def rebuild_timelines():
+    """Tüm inbox'ları follows + posts tablosundan baştan kurar"""
+    cols = ["user_id", "post_id", "author_id", "created_at"]
+    heavy = db.select(User.id).where(User.followers_count > TIMELINE_FANOUT_LIMIT)
+    db.session.query(TimelineEntry).delete(synchronize_session=False)
+    db.session.execute(
+        db.insert(TimelineEntry).from_select(cols, db.select(Post.user_id, Post.id, Post.user_id, Post.created_at))
+    )
+    db.session.execute(
+        db.insert(TimelineEntry).from_select(
+            cols,
+            db.select(Follow.follower_id, Post.id, Post.user_id, Post.created_at)
+            .join(Post, Post.user_id == Follow.following_id)
+            .where(Follow.following_id.not_in(heavy)),
+        )
+    )
+    db.session.commit()
+
+
+@app.cli.command("rebuild-timelines")
+def rebuild_timelines_command():
+    """Takip akışı inbox'larını yeniden kur"""
+    rebuild_timelines()
+    print("✅ Takip akışları yeniden kuruldu")
+
+
+# ----------------------------
+# Hydration (N+1 yerine sabit sayıda IN sorgusu)
+# ----------------------------
+def _by_id(model, ids):
+    ids = list(set(ids))
+    if not ids:
+        return {}
+    return {obj.id: obj for obj in db.session.query(model).filter(model.id.in_(ids)).all()}
+
+
+def users_by_id(user_ids):
+    return _by_id(User, user_ids)
+
+
+def hydrate_feed_events(events):
+    """FeedEvent listesi -> feed item'ları.
+
+    Post, alert ve yazarlar toplam en fazla 3 sorguda yüklenir;
+    silinmiş referanslar atlanır, sıra korunur.
+    """
+    posts = _by_id(Post, [ev.ref_id for ev in events if ev.type == "post"])
+    alerts = _by_id(PriceAlert, [ev.ref_id for ev in events if ev.type == "alert"])
+    users = users_by_id(p.user_id for p in posts.values())
+
+    items = []
+    for ev in events:
+        if ev.type == "post":
+            post = posts.get(ev.ref_id)
+            if not post:
+                continue
+            avg, cnt = rating_summary(post.rating_sum, post.rating_count)
+            items.append({"type": "post", "post": post, "user": users.get(post.user_id), "avg": avg, "cnt": cnt})
+        elif ev.type == "alert":
+            alert = alerts.get(ev.ref_id)
+            if not alert:
+                continue
+            items.append({"type": "alert", "alert": alert})
+    return items
+
+
+def hydrate_posts(posts):
+    """Post listesi -> feed item'ları (yazarlar tek sorguda)"""
+    users = users_by_id(p.user_id for p in posts)
+    items = []
+    for post in posts:
+        avg, cnt = rating_summary(post.rating_sum, post.rating_count)
+        items.append({"type": "post", "post": post, "user": users.get(post.user_id), "avg": avg, "cnt": cnt})
+    return items
+
+
+def hydrate_comments(comments):
+    """SymbolComment listesi -> [{comment, user, avg, cnt}] (1 sorgu)"""
+    users = users_by_id(c.user_id for c in comments)
+    out = []
+    for c in comments:
+        avg, cnt = rating_summary(c.rating_sum, c.rating_count)
+        out.append({"comment": c, "user": users.get(c.user_id), "avg": avg, "cnt": cnt})
+    return out
+
 
-    if cached:
-        if age < CACHE_TTL_SECONDS:
-            return cached
-        else:
-            return cached
+def mark_following(items, viewer):
+    """Feed item'larına viewer'ın yazarı takip edip etmediğini ekler (1 sorgu)"""
+    if not viewer:
+        return items
+    followed = following_ids(viewer.id, [it["user"].id for it in items if it.get("user")])
+    for it in items:
+        if it.get("user"):
+            it["is_following"] = it["user"].id in followed
+    return items
+
+
+def feed_item_json(item):
+    if item["type"] == "alert":
+        alert = item["alert"]
+        return {
+            "type": "alert",
+            "id": alert.id,
+            "created_at": alert.created_at.isoformat(),
+            "alert": {
+                "symbol_key": alert.symbol_key,
+                "change_pct": alert.change_pct,
+                "window": alert.window,
+                "price": alert.last_price,
+            }
+        }
 
-    return _placeholder_prices()
+    post = item["post"]
+    user = item["user"]
+    return {
+        "type": "post",
+        "id": post.id,
+        "content": post.content,
+        "symbol_key": post.symbol_key,
+        "image_url": post.image_url,
+        "created_at": post.created_at.isoformat(),
+        "user": {
+            "id": user.id,
+            "username": user.username,
+            "full_name": user.full_name,
+            "is_following": item.get("is_following"),
+        } if user else None,
+        "rating": {"avg": item["avg"], "count": item["cnt"], "my": None}
+    }
 
 
-# ----------------------------
-# DB init
-# ----------------------------
-with app.app_context():
-    db.create_all()
+def comment_item_json(item):
+    c = item["comment"]
+    u = item["user"]
+    return {
+        "id": c.id,
+        "content": c.content,
+        "created_at": c.created_at.isoformat(),
+        "user": {
+            "id": u.id,
+            "username": u.username,
+            "full_name": u.full_name,
+        } if u else None,
+        "rating": {"avg": item["avg"], "cnt": item["cnt"]}
+    }
 
 
 # ----------------------------
-# Rating summaries
+# Full-text search (PostgreSQL tsvector / SQLite FTS5)
 # ----------------------------
-def post_rating_summary(post_id: int, refresh: bool = False):
-    q = db.session.query(
-        db.func.avg(PostRating.stars),
-        db.func.count(PostRating.id),
-    ).filter(PostRating.post_id == post_id)
-    avg, cnt = q.first()
-    avg = float(avg) if avg is not None else 0.0
-    cnt = int(cnt or 0)
-    return avg, cnt
+# Türkçe büyük/küçük harf kuralları + aksan katlama: "ALTIN", "Altın" ve
+# "altin" aynı terime iner. PostgreSQL'deki translate() aynı tabloyu kullanır.
+_FOLD_FROM = "İIıŞşĞğÜüÖöÇçÂâÎîÛû"
+_FOLD_TO = "iiissgguuooccaaiiuu"
+_FOLD_TABLE = str.maketrans(_FOLD_FROM, _FOLD_TO)
+_WORD_RE = re.compile(r"[^\W_]+")
 
-
-def comment_rating_summary(comment_id: int):
-    q = db.session.query(
-        db.func.avg(CommentRating.stars),
-        db.func.count(CommentRating.id),
-    ).filter(CommentRating.comment_id == comment_id)
-    avg, cnt = q.first()
-    avg = float(avg) if avg is not None else 0.0
-    cnt = int(cnt or 0)
-    return avg, cnt
+SEARCH_TABLES = ("posts", "symbol_comments")
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGES = 25
+SEARCH_MAX_TERMS = 8
 
 
-def top_posts_by_rating(limit=10):
-    rows = (
-        db.session.query(
-            Post,
-            db.func.avg(PostRating.stars).label("avg"),
-            db.func.count(PostRating.id).label("cnt"),
+def search_fold(text):
+    """Uzunluğu koruyarak katlar; vurgu offset'leri orijinal metne denk gelir"""
+    out = []
+    for ch in (text or "").translate(_FOLD_TABLE):
+        low = ch.lower()
+        out.append(low if len(low) == 1 else ch)
+    return "".join(out)
+
+
+def search_terms(q: str):
+    return _WORD_RE.findall(search_fold(q))[:SEARCH_MAX_TERMS]
+
+
+def _ensure_search_schema():
+    """Arama index'lerini kurar. PostgreSQL'de tsvector generated column + GIN
+    (veritabanı kendisi güncel tutar); SQLite'ta contentless FTS5 tablosu ve
+    tetikleyiciler. FTS tablosu yeni oluştuysa mevcut satırlarla doldurulur."""
+    dialect = db.engine.dialect.name
+    with db.engine.begin() as conn:
+        for table in SEARCH_TABLES:
+            if dialect == "postgresql":
+                folded = f"lower(translate(content, '{_FOLD_FROM}', '{_FOLD_TO}'))"
+                conn.execute(db.text(
+                    f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_tsv tsvector "
+                    f"GENERATED ALWAYS AS (to_tsvector('turkish'::regconfig, {folded})) STORED"
+                ))
+                conn.execute(db.text(f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN (search_tsv)"))
+            elif dialect == "sqlite":
+                fts = f"{table}_fts"
+                exists = conn.execute(
+                    db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n"), {"n": fts}
+                ).first()
+                add = f"INSERT INTO {fts}(rowid, body) VALUES (new.id, search_fold(new.content));"
+                remove = f"INSERT INTO {fts}({fts}, rowid, body) VALUES ('delete', old.id, search_fold(old.content));"
+                conn.execute(db.text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"body, content='', tokenize='unicode61 remove_diacritics 2')"
+                ))
+                conn.execute(db.text(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {add} END"))
+                conn.execute(db.text(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {remove} END"))
+                conn.execute(db.text(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF content ON {table} BEGIN {remove} {add} END"
+                ))
+                if not exists:
+                    conn.execute(db.text(f"INSERT INTO {fts}(rowid, body) SELECT id, search_fold(content) FROM {table}"))
+                    print(f"🛠 Arama index'i kuruldu: {fts}")
+
+
+def rebuild_search_index():
+    """SQLite FTS tablolarını baştan doldurur (PostgreSQL'de kolon generated, gerek yok)"""
+    if db.engine.dialect.name != "sqlite":
+        return
+    with db.engine.begin() as conn:
+        for table in SEARCH_TABLES:
+            fts = f"{table}_fts"
+            conn.execute(db.text(f"INSERT INTO {fts}({fts}) VALUES ('delete-all')"))
+            conn.execute(db.text(f"INSERT INTO {fts}(rowid, body) SELECT id, search_fold(content) FROM {table}"))
+
+
+@app.cli.command("rebuild-search")
+def rebuild_search_command():
+    """Arama index'ini yeniden kur"""
+    rebuild_search_index()
+    print("✅ Arama index'i yeniden kuruldu")
+
+
+def _search_ids(table: str, terms, offset: int, limit: int):
+    """Eşleşen satır id'leri, en alakalı önce"""
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        sql = (
+            f"SELECT id FROM {table}, to_tsquery('turkish', :q) query "
+            f"WHERE search_tsv @@ query "
+            f"ORDER BY ts_rank_cd(search_tsv, query) DESC, id DESC LIMIT :limit OFFSET :offset"
         )
-        .outerjoin(PostRating, PostRating.post_id == Post.id)
-        .group_by(Post.id)
-        .all()
-    )
-
-    enriched = []
-    for p, avg, cnt in rows:
-        score = float(avg or 0.0) * (1.0 + (int(cnt or 0) / 5.0))
-        enriched.append((score, p, float(avg or 0.0), int(cnt or 0)))
+        q = " & ".join(f"{t}:*" for t in terms)
+    elif dialect == "sqlite":
+        fts = f"{table}_fts"
+        sql = (
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH :q "
+            f"ORDER BY bm25({fts}), rowid DESC LIMIT :limit OFFSET :offset"
+        )
+        q = " ".join(f'"{t}"*' for t in terms)
+    else:
+        raise RuntimeError(f"Full-text search not supported on {dialect}")
+    rows = db.session.execute(db.text(sql), {"q": q, "limit": limit, "offset": offset})
+    return [r[0] for r in rows]
+
+
+def search_snippet(text: str, terms, width: int = 160) -> str:
+    """Terimle başlayan kelimeleri <mark> ile işaretler; HTML-escape edilmiş
+    ve ilk eşleşme etrafında kırpılmış bir parça döner."""
+    text = text or ""
+    spans = [m.span() for m in _WORD_RE.finditer(search_fold(text)) if m.group().startswith(tuple(terms))]
+    start = max(0, spans[0][0] - 40) if spans else 0
+    end = min(len(text), start + width)
+
+    out = ["…"] if start > 0 else []
+    pos = start
+    for a, b in spans:
+        if a < pos:
+            continue
+        if a >= end:
+            break
+        b = min(b, end)
+        out.append(str(escape(text[pos:a])))
+        out.append(f"<mark>{escape(text[a:b])}</mark>")
+        pos = b
+    out.append(str(escape(text[pos:end])))
+    if end < len(text):
+        out.append("…")
+    return "".join(out)
+
+
+def search_content(q: str, page: int):
+    """Post ve sembol yorumlarında arama: {"posts", "comments", "next_page"}"""
+    terms = search_terms(q)
+    if not terms:
+        return {"posts": [], "comments": [], "next_page": None}
+
+    offset = (page - 1) * SEARCH_PAGE_SIZE
+    post_ids = _search_ids("posts", terms, offset, SEARCH_PAGE_SIZE + 1)
+    comment_ids = _search_ids("symbol_comments", terms, offset, SEARCH_PAGE_SIZE + 1)
+    has_more = len(post_ids) > SEARCH_PAGE_SIZE or len(comment_ids) > SEARCH_PAGE_SIZE
+    post_ids, comment_ids = post_ids[:SEARCH_PAGE_SIZE], comment_ids[:SEARCH_PAGE_SIZE]
+
+    posts = _by_id(Post, post_ids)
+    comments = _by_id(SymbolComment, comment_ids)
+    post_items = hydrate_posts([posts[i] for i in post_ids if i in posts])
+    comment_items = hydrate_comments([comments[i] for i in comment_ids if i in comments])
+
+    out_posts = []
+    for item in post_items:
+        row = feed_item_json(item)
+        row["snippet"] = search_snippet(item["post"].content, terms)
+        out_posts.append(row)
+    out_comments = []
+    for item in comment_items:
+        row = comment_item_json(item)
+        row["symbol_key"] = item["comment"].symbol_key
+        row["snippet"] = search_snippet(item["comment"].content, terms)
+        out_comments.append(row)
 
-    enriched.sort(key=lambda x: x[0], reverse=True)
-    out = []
-    for score, p, avg, cnt in enriched[:limit]:
-        u = db.session.get(User, p.user_id)
-        out.append({"post": p, "user": u, "avg": avg, "cnt": cnt})
-    return out
+    return {
+        "posts": out_posts,
+        "comments": out_comments,
+        "next_page": page + 1 if has_more and page < SEARCH_MAX_PAGES else None,
+    }
 
 
-def trending_symbols_by_comments(limit=10):
-    rows = (
-        db.session.query(
-            SymbolComment.symbol_key,
-            db.func.count(SymbolComment.id).label("cnt"),
-        )
-        .group_by(SymbolComment.symbol_key)
-        .order_by(db.func.count(SymbolComment.id).desc())
-        .limit(limit)
-        .all()
-    )
-    return [{"symbol_key": r[0], "cnt": int(r[1])} for r in rows]
+# ----------------------------
+# DB init
+# ----------------------------
+# Yerini yeni index'lere bırakanlar; eski kurulumlarda yazma maliyeti olmasın
+_OBSOLETE_INDEXES = ("ix_feed_events_rank",)
+
+
+def _ensure_schema():
+    """create_all yeni tabloları oluşturur; mevcut tablolara sonradan eklenen
+    kolon ve index'leri de burada ekleriz. Eklenen (tablo, kolon) çiftlerini döner."""
+    db.create_all(bind_key=None)  # replika bind'i salt okunur, dokunma
+    insp = db.inspect(db.engine)
+    added = set()
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(dialect=db.engine.dialect)}"
+                if col.server_default is not None:
+                    ddl += f" DEFAULT {col.server_default.arg}"
+                if not col.nullable:
+                    ddl += " NOT NULL"
+                conn.execute(db.text(ddl))
+                added.add((table.name, col.name))
+                print(f"🛠 Kolon eklendi: {table.name}.{col.name}")
+            for idx in table.indexes:
+                idx.create(bind=conn, checkfirst=True)
+    with db.engine.begin() as conn:
+        for name in _OBSOLETE_INDEXES:
+            conn.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+    return added
+
+
+def init_db():
+    """Şema kurulumu + yeni kolonların backfill'i. Import sırasında çalışmaz;
+    deploy başında bir kez `flask --app app init-db` ile (idempotent)."""
+    added = _ensure_schema()
+    _ensure_search_schema()
+    if added & {("posts", "rating_sum"), ("symbol_comments", "rating_sum"), ("posts", "top_score")}:
+        rebuild_rating_aggregates()
+    if added & {("users", "followers_count"), ("users", "following_count")}:
+        rebuild_follow_counts()
+    if ("feed_events", "hot") in added:
+        rebuild_feed_ranks()
+    # Sayaç tabloları yeni oluşturulduysa mevcut yorumlardan bir kez kur
+    if db.session.query(SymbolTrend.symbol_key).first() is None and db.session.query(SymbolComment.id).first():
+        rebuild_symbol_trends()
+    # Inbox tablosu yeni oluşturulduysa mevcut takiplerden doldur
+    if db.session.query(TimelineEntry.id).first() is None and db.session.query(Post.id).first():
+        rebuild_timelines()
+
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Tabloları, eksik kolonları ve index'leri kur"""
+    init_db()
+    print("✅ Veritabanı hazır")
 
 
 # ----------------------------
@@ -473,43 +2639,31 @@ def trending_symbols_by_comments(limit=10):
 # ----------------------------
 @app.route("/")
 def index():
-    return render_template("index.html", user=current_user())
+    return render_template("index.html", user=current_identity())
 
 
 @app.route("/feed")
 def feed():
     events = (
         db.session.query(FeedEvent)
-        .order_by(FeedEvent.score.desc(), FeedEvent.created_at.desc())
+        .order_by(FeedEvent.hot.desc(), FeedEvent.id.desc())
         .limit(50)
         .all()
     )
+    me = current_identity()
+    items = mark_following(hydrate_feed_events(events), me)
 
-    items = []
-    for ev in events:
-        if ev.type == "post":
-            post = db.session.get(Post, ev.ref_id)
-            if not post:
-                continue
-            user = db.session.get(User, post.user_id)
-            avg, cnt = post_rating_summary(post.id)
-            items.append({"type": "post", "post": post, "user": user, "avg": avg, "cnt": cnt})
-        elif ev.type == "alert":
-            alert = db.session.get(PriceAlert, ev.ref_id)
-            if not alert:
-                continue
-            items.append({"type": "alert", "alert": alert})
-
-    return render_template("feed.html", user=current_user(), items=items)
+    return render_template("feed.html", user=me, items=items)
 
 
 @app.route("/explore")
 def explore():
-    top_posts = top_posts_by_rating(limit=10)
-    trending_symbols = trending_symbols_by_comments(limit=10)
+    payload = cached_result(("explore", int(time.time() // 3600)), ("explore",), explore_payload)
+    top_posts = payload["posts"]
+    trending_symbols = payload["symbols"]
     return render_template(
         "explore.html",
-        user=current_user(),
+        user=current_identity(),
         top_posts=top_posts,
         trending_symbols=trending_symbols,
     )
@@ -541,6 +2695,8 @@ def settings():
             u.avatar_url = preset if preset else None
 
         db.session.commit()
+        bump_generations("feed", "explore", "comments", "search")
+        remember_identity(u)
         flash("Profil güncellendi.", "ok")
         return redirect(url_for("settings"))
 
@@ -562,22 +2718,12 @@ def profile(username):
         .all()
     )
 
-    followers = db.session.query(Follow).filter(Follow.following_id == u.id).count()
-    following = db.session.query(Follow).filter(Follow.follower_id == u.id).count()
-
-    me = current_user()
-    is_following = False
-    if me and me.id != u.id:
-        is_following = (
-            db.session.query(Follow)
-            .filter(Follow.follower_id == me.id, Follow.following_id == u.id)
-            .first()
-            is not None
-        )
+    me = current_identity()
+    is_following = bool(me and me.id != u.id and following_ids(me.id, [u.id]))
 
     post_meta = {}
     for p in posts:
-        avg, cnt = post_rating_summary(p.id)
+        avg, cnt = rating_summary(p.rating_sum, p.rating_count)
         post_meta[p.id] = {"avg": avg, "cnt": cnt}
 
     return render_template(
@@ -585,8 +2731,8 @@ def profile(username):
         user=me,
         profile_user=u,
         posts=posts,
-        followers=followers,
-        following=following,
+        followers=u.followers_count,
+        following=u.following_count,
         is_following=is_following,
         post_meta=post_meta,
     )
@@ -600,7 +2746,7 @@ def symbol_page(symbol_key):
 
     return render_template(
         "symbol.html",
-        user=current_user(),
+        user=current_identity(),
         symbol_key=symbol_key.upper(),
     )
 
@@ -614,13 +2760,13 @@ def symbol_page(symbol_key):
 @app.route("/register")
 def register():
     """Kayıt sayfası (asıl kayıt /api/auth/register'da)"""
-    return render_template("register.html", user=current_user())
+    return render_template("register.html", user=current_identity())
 
 
 @app.route("/login")
 def login():
     """Giriş sayfası (asıl giriş /api/auth/login'de)"""
-    return render_template("login.html", user=current_user())
+    return render_template("login.html", user=current_identity())
 
 
 @app.route("/logout")
@@ -638,7 +2784,7 @@ def google_login():
         flash("Google giriş ayarlı değil (env eksik).", "err")
         return redirect(url_for("login"))
     redirect_uri = url_for("google_callback", _external=True)
-    return oauth.google.authorize_redirect(redirect_uri)
+    return google_oauth().authorize_redirect(redirect_uri)
 
 
 @app.route("/auth/google/callback")
@@ -646,10 +2792,10 @@ def google_callback():
     if not (GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET):
         abort(404)
 
-    token = oauth.google.authorize_access_token()
+    token = google_oauth().authorize_access_token()
     userinfo = token.get("userinfo")
     if not userinfo:
-        userinfo = oauth.google.parse_id_token(token)
+        userinfo = google_oauth().parse_id_token(token)
 
     google_id = userinfo.get("sub")
     full_name = userinfo.get("name") or "Google User"
@@ -674,6 +2820,7 @@ def google_callback():
         db.session.commit()
 
     session["user_id"] = u.id
+    remember_identity(u)
     return redirect(url_for("index"))
 
 
@@ -710,6 +2857,7 @@ def api_register():
     db.session.commit()
 
     session["user_id"] = u.id
+    remember_identity(u)
     return jsonify({"success": True, "username": u.username})
 
 
@@ -725,6 +2873,7 @@ def api_login():
         return jsonify({"error": "Hatalı bilgiler"}), 401
 
     session["user_id"] = u.id
+    remember_identity(u)
     return jsonify({"success": True, "username": u.username})
 
 
@@ -754,18 +2903,27 @@ def api_profile(username):
         return jsonify({"error": "User not found"}), 404
 
     me = current_user()
+    limit = page_limit(50)
     
-    posts = (
-        db.session.query(Post)
-        .filter(Post.user_id == u.id)
-        .order_by(Post.created_at.desc())
-        .limit(50)
-        .all()
-    )
+    try:
+        posts, posts_next = keyset_page(
+            db.session.query(Post).filter(Post.user_id == u.id),
+            (Post.created_at, Post.id),
+            request.args.get("posts_cursor"),
+            limit,
+        )
+        comments, comments_next = keyset_page(
+            db.session.query(SymbolComment).filter(SymbolComment.user_id == u.id),
+            (SymbolComment.created_at, SymbolComment.id),
+            request.args.get("comments_cursor"),
+            limit,
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
     
     posts_json = []
     for p in posts:
-        avg, cnt = post_rating_summary(p.id)
+        avg, cnt = rating_summary(p.rating_sum, p.rating_count)
         posts_json.append({
             "id": p.id,
             "content": p.content,
@@ -775,14 +2933,6 @@ def api_profile(username):
             "rating": {"avg": avg, "count": cnt}
         })
     
-    comments = (
-        db.session.query(SymbolComment)
-        .filter(SymbolComment.user_id == u.id)
-        .order_by(SymbolComment.created_at.desc())
-        .limit(50)
-        .all()
-    )
-    
     comments_json = [{
         "id": c.id,
         "symbol_key": c.symbol_key,
@@ -790,16 +2940,7 @@ def api_profile(username):
         "created_at": c.created_at.isoformat()
     } for c in comments]
     
-    followers = db.session.query(Follow).filter(Follow.following_id == u.id).count()
-    following = db.session.query(Follow).filter(Follow.follower_id == u.id).count()
-    
-    is_following = False
-    if me and me.id != u.id:
-        is_following = (
-            db.session.query(Follow)
-            .filter(Follow.follower_id == me.id, Follow.following_id == u.id)
-            .first() is not None
-        )
+    is_following = bool(me and me.id != u.id and following_ids(me.id, [u.id]))
     
     return jsonify({
         "id": u.id,
@@ -807,12 +2948,13 @@ def api_profile(username):
         "full_name": u.full_name,
         "bio": u.bio,
         "avatar_url": u.avatar_url if u.avatar_type == "preset" else ui_avatar_url(u.full_name),
-        "followers": followers,
-        "following": following,
+        "followers": u.followers_count,
+        "following": u.following_count,
         "is_following": is_following,
         "is_me": me and me.id == u.id,
         "posts": posts_json,
         "comments": comments_json,
+        "next_cursor": {"posts": posts_next, "comments": comments_next},
     })
 
 
@@ -841,6 +2983,8 @@ def api_settings_profile():
         u.avatar_url = avatar_url_val if avatar_url_val else None
     
     db.session.commit()
+    bump_generations("feed", "explore", "comments", "search")
+    remember_identity(u)
     return jsonify({"success": True})
 
 
@@ -849,90 +2993,106 @@ def api_feed():
     """Feed (JSON)"""
     filter_type = request.args.get("filter", "all")
     
-    query = db.session.query(FeedEvent).order_by(
-        FeedEvent.score.desc(), 
-        FeedEvent.created_at.desc()
-    )
+    if filter_type == "following":
+        return _api_following_feed()
+    
+    # Yazar takip durumu yanıta girdiği için giriş yapmışsa ETag kişiye özel
+    me = current_identity()
+    etag = generation_etag("feed", suffix=f"-u{me.id}" if me else "")
+    nm = not_modified(etag)
+    if nm:
+        return nm
+    
+    query = db.session.query(FeedEvent)
     
     if filter_type == "posts":
         query = query.filter(FeedEvent.type == "post")
     elif filter_type == "alerts":
         query = query.filter(FeedEvent.type == "alert")
     elif filter_type == "hot":
-        query = query.filter(FeedEvent.score > 10)
+        query = query.filter(FeedEvent.is_hot.is_(True))
     
-    events = query.limit(50).all()
+    try:
+        events, next_cursor = keyset_page(
+            query,
+            (FeedEvent.hot, FeedEvent.id),
+            request.args.get("cursor"),
+            page_limit(50),
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
     
-    items = []
-    for ev in events:
-        if ev.type == "post":
-            post = db.session.get(Post, ev.ref_id)
-            if not post:
-                continue
-            user = db.session.get(User, post.user_id)
-            avg, cnt = post_rating_summary(post.id)
-            
-            items.append({
-                "type": "post",
-                "id": post.id,
-                "content": post.content,
-                "symbol_key": post.symbol_key,
-                "image_url": post.image_url,
-                "created_at": post.created_at.isoformat(),
-                "user": {
-                    "id": user.id,
-                    "username": user.username,
-                    "full_name": user.full_name,
-                } if user else None,
-                "rating": {"avg": avg, "count": cnt, "my": None}
-            })
-        
-        elif ev.type == "alert":
-            alert = db.session.get(PriceAlert, ev.ref_id)
-            if not alert:
-                continue
-            items.append({
-                "type": "alert",
-                "id": alert.id,
-                "created_at": alert.created_at.isoformat(),
-                "alert": {
-                    "symbol_key": alert.symbol_key,
-                    "change_pct": alert.change_pct,
-                    "window": alert.window,
-                    "price": alert.last_price,
-                }
-            })
+    items = [feed_item_json(item) for item in mark_following(hydrate_feed_events(events), me)]
     
-    return jsonify({"items": items})
+    resp = with_etag(jsonify({"items": items, "next_cursor": next_cursor}), etag)
+    if me:
+        resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
 
 
-@app.route("/api/posts", methods=["POST"])
-def api_create_post():
-    """Post oluştur (JSON)"""
-    u = current_user()
-    if not u:
+def _api_following_feed():
+    me = current_identity()
+    if not me:
         return jsonify({"error": "Login required"}), 401
     
-    data = request.get_json()
+    etag = generation_etag("feed", suffix=f"-u{me.id}")
+    nm = not_modified(etag)
+    if nm:
+        return nm
+    
+    try:
+        posts, next_cursor = timeline_page(me.id, request.args.get("cursor"), page_limit(50))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    
+    items = [feed_item_json(item) for item in mark_following(hydrate_posts(posts), me)]
+    
+    resp = with_etag(jsonify({"items": items, "next_cursor": next_cursor}), etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+POST_SYMBOL_MAP = {"BTC": "btc", "GOLD": "gold", "SILVER": "silver",
+                   "USDTRY": "usd_try", "EURTRY": "eur_try", "BIST100": "bist100"}
+
+
+def parse_post_input(data):
+    """JSON post girdisi -> (content, symbol_key, error)"""
+    if not isinstance(data, dict):
+        return None, None, "Invalid item"
     content = (data.get("content") or "").strip()
     symbol_key = (data.get("symbol_key") or "").strip().upper() or None
     
     if not content:
-        return jsonify({"error": "Content required"}), 400
+        return None, None, "Content required"
     if len(content) > 800:
-        return jsonify({"error": "Too long"}), 400
+        return None, None, "Too long"
+    
+    symbol_key = POST_SYMBOL_MAP.get(symbol_key) if symbol_key else None
+    return content, symbol_key, None
+
+
+@app.route("/api/posts", methods=["POST"])
+def api_create_post():
+    """Post oluştur (JSON)"""
+    u = current_user()
+    if not u:
+        return jsonify({"error": "Login required"}), 401
     
-    symbol_map = {"BTC": "btc", "GOLD": "gold", "SILVER": "silver", 
-                  "USDTRY": "usd_try", "EURTRY": "eur_try", "BIST100": "bist100"}
-    symbol_key = symbol_map.get(symbol_key) if symbol_key else None
+    data = request.get_json()
+    content, symbol_key, error = parse_post_input(data)
+    if error:
+        return jsonify({"error": error}), 400
     
     p = Post(user_id=u.id, content=content, symbol_key=symbol_key)
     db.session.add(p)
     db.session.flush()
     
-    fe = FeedEvent(type="post", ref_id=p.id, score=1.0)
+    fe = FeedEvent(type="post", ref_id=p.id, score=1.0, hot=hot_rank(0, p.created_at))
     db.session.add(fe)
+    fanout_post(p)
     db.session.commit()
+    bump_generations("feed", "explore", "search")
     
     return jsonify({"success": True, "post_id": p.id})
 @app.route("/api/posts/<int:post_id>", methods=["DELETE"])
@@ -955,12 +3115,14 @@ def api_delete_post(post_id):
         FeedEvent.ref_id == post_id
     ).delete()
     
-    # Rating'leri sil
+    # Rating'leri ve inbox kopyalarını sil
     db.session.query(PostRating).filter(PostRating.post_id == post_id).delete()
+    db.session.query(TimelineEntry).filter(TimelineEntry.post_id == post_id).delete()
     
     # Post'u sil
     db.session.delete(post)
     db.session.commit()
+    bump_generations("feed", "explore", "search")
     
     return jsonify({"success": True})
 
@@ -989,6 +3151,7 @@ def api_edit_post(post_id):
     
     post.content = new_content
     db.session.commit()
+    bump_generations("feed", "explore", "search")
     
     return jsonify({"success": True, "content": post.content})
 
@@ -1009,46 +3172,176 @@ def api_rate():
         return jsonify({"error": "Invalid stars"}), 400
     
     if kind == "post":
-        r = db.session.query(PostRating).filter(
-            PostRating.post_id == ref_id,
-            PostRating.user_id == u.id
-        ).first()
-        if r:
-            r.stars = stars
-        else:
-            r = PostRating(post_id=ref_id, user_id=u.id, stars=stars)
-            db.session.add(r)
-        
-        avg, cnt = post_rating_summary(ref_id, refresh=True)
-        
-        fe = db.session.query(FeedEvent).filter(
-            FeedEvent.type == "post",
-            FeedEvent.ref_id == ref_id
-        ).first()
-        if fe:
-            fe.score = float(avg) * (1.0 + (cnt / 10.0))
+        row = apply_post_rating(ref_id, u.id, stars)
+        if row is None:
+            return jsonify({"error": "Not found"}), 404
+        avg, cnt = refresh_post_rank(ref_id, row)
         
         db.session.commit()
+        bump_generations("feed", "explore", "search")
         return jsonify({"avg": avg, "count": cnt, "my": stars})
     
     elif kind == "comment":
-        r = db.session.query(CommentRating).filter(
-            CommentRating.comment_id == ref_id,
-            CommentRating.user_id == u.id
-        ).first()
-        if r:
-            r.stars = stars
-        else:
-            r = CommentRating(comment_id=ref_id, user_id=u.id, stars=stars)
-            db.session.add(r)
-        
-        avg, cnt = comment_rating_summary(ref_id)
+        row = apply_comment_rating(ref_id, u.id, stars)
+        if row is None:
+            return jsonify({"error": "Not found"}), 404
+        avg, cnt = rating_summary(row.rating_sum, row.rating_count)
         db.session.commit()
+        bump_generations("search", f"comments:{row.symbol_key}")
         return jsonify({"avg": avg, "count": cnt, "my": stars})
     
     return jsonify({"error": "Invalid kind"}), 400
 
 
+# ----------------------------
+# Bulk endpoints (import / offline senkron)
+# ----------------------------
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "200"))
+
+
+def _bulk_items(key: str):
+    data = request.get_json(silent=True) or {}
+    items = data.get(key)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": f"'{key}' must be a non-empty list"}), 400)
+    if len(items) > BULK_MAX_ITEMS:
+        return None, (jsonify({"error": f"At most {BULK_MAX_ITEMS} items"}), 413)
+    return items, None
+
+
+def _chunks(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+@app.route("/api/posts/bulk", methods=["POST"])
+def api_create_posts_bulk():
+    """Toplu post: {"posts": [{content, symbol_key}, ...]} -> item başına sonuç"""
+    u = current_user()
+    if not u:
+        return jsonify({"error": "Login required"}), 401
+    items, err = _bulk_items("posts")
+    if err:
+        return err
+    
+    results = [None] * len(items)
+    valid = []
+    for i, data in enumerate(items):
+        content, symbol_key, error = parse_post_input(data)
+        if error:
+            results[i] = {"index": i, "ok": False, "error": error}
+        else:
+            valid.append((i, content, symbol_key))
+    
+    written = 0
+    for chunk in _chunks(valid, BULK_CHUNK_SIZE):
+        try:
+            rows = db.session.execute(
+                db.insert(Post).returning(Post.id, Post.created_at, sort_by_parameter_order=True),
+                [{"user_id": u.id, "content": content, "symbol_key": symbol_key} for _, content, symbol_key in chunk],
+            ).all()
+            db.session.execute(
+                db.insert(FeedEvent),
+                [{"type": "post", "ref_id": r.id, "score": 1.0, "hot": hot_rank(0, r.created_at), "created_at": r.created_at}
+                 for r in rows],
+            )
+            fanout_posts(u.id, [r.id for r in rows])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Bulk post chunk error: {e}")
+            for i, _, _ in chunk:
+                results[i] = {"index": i, "ok": False, "error": "Write failed"}
+            continue
+        for (i, _, _), r in zip(chunk, rows):
+            results[i] = {"index": i, "ok": True, "post_id": r.id}
+        written += len(rows)
+    
+    if written:
+        bump_generations("feed", "explore", "search")
+    return jsonify({"written": written, "results": results})
+
+
+@app.route("/api/rate/bulk", methods=["POST"])
+def api_rate_bulk():
+    """Toplu rating: {"ratings": [{kind, id, stars}, ...]} -> item başına sonuç.
+    Aynı hedef birden çok kez gelirse sonuncusu geçerlidir."""
+    u = current_user()
+    if not u:
+        return jsonify({"error": "Login required"}), 401
+    items, err = _bulk_items("ratings")
+    if err:
+        return err
+    
+    results = [None] * len(items)
+    latest = {}  # (kind, ref_id) -> (index, stars)
+    for i, data in enumerate(items):
+        try:
+            kind = data.get("kind")
+            ref_id = int(data.get("id"))
+            stars = int(data.get("stars"))
+        except (AttributeError, TypeError, ValueError):
+            results[i] = {"index": i, "ok": False, "error": "Invalid item"}
+            continue
+        if kind not in ("post", "comment"):
+            results[i] = {"index": i, "ok": False, "error": "Invalid kind"}
+        elif stars < 1 or stars > 5:
+            results[i] = {"index": i, "ok": False, "error": "Invalid stars"}
+        else:
+            if (kind, ref_id) in latest:
+                prev_i = latest[(kind, ref_id)][0]
+                results[prev_i] = {"index": prev_i, "ok": True, "superseded": True}
+            latest[(kind, ref_id)] = (i, stars)
+    
+    targets = {
+        "post": (Post, PostRating, PostRating.post_id),
+        "comment": (SymbolComment, CommentRating, CommentRating.comment_id),
+    }
+    touched_symbols = set()
+    touched_posts = False
+    for kind, (model, rating_model, ref_col) in targets.items():
+        wanted = [(ref_id, i, stars) for (k, ref_id), (i, stars) in latest.items() if k == kind]
+        for chunk in _chunks(wanted, BULK_CHUNK_SIZE):
+            cols = [model.id] + ([SymbolComment.symbol_key] if model is SymbolComment else [])
+            existing = {r[0]: r for r in db.session.query(*cols).filter(model.id.in_([c[0] for c in chunk])).all()}
+            for ref_id, i, _ in chunk:
+                if ref_id not in existing:
+                    results[i] = {"index": i, "ok": False, "error": "Not found"}
+            chunk = [c for c in chunk if c[0] in existing]
+            if not chunk:
+                continue
+            try:
+                apply_ratings_bulk(model, rating_model, ref_col, u.id, {ref_id: stars for ref_id, _, stars in chunk})
+                if model is Post:
+                    summaries = refresh_post_ranks([c[0] for c in chunk])
+                else:
+                    summaries = {
+                        r.id: rating_summary(r.rating_sum, r.rating_count)
+                        for r in db.session.query(SymbolComment.id, SymbolComment.rating_sum, SymbolComment.rating_count)
+                        .filter(SymbolComment.id.in_([c[0] for c in chunk]))
+                    }
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Bulk rating chunk error: {e}")
+                for _, i, _ in chunk:
+                    results[i] = {"index": i, "ok": False, "error": "Write failed"}
+                continue
+            for ref_id, i, stars in chunk:
+                avg, cnt = summaries.get(ref_id, (0.0, 0))
+                results[i] = {"index": i, "ok": True, "avg": avg, "count": cnt, "my": stars}
+            if model is Post:
+                touched_posts = True
+            else:
+                touched_symbols.update(existing[ref_id][1] for ref_id, _, _ in chunk)
+    
+    if touched_posts or touched_symbols:
+        names = (["feed", "explore"] if touched_posts else []) + [f"comments:{k}" for k in touched_symbols if k in PRICE_SYMBOLS]
+        bump_generations("search", *names)
+    return jsonify({"results": results})
+
+
 @app.route("/api/follow", methods=["POST"])
 def api_follow():
     """Follow/unfollow (JSON)"""
@@ -1064,27 +3357,21 @@ def api_follow():
     if not target or target.id == me.id:
         return jsonify({"error": "Invalid target"}), 404
     
-    existing = db.session.query(Follow).filter(
-        Follow.follower_id == me.id,
-        Follow.following_id == target.id
-    ).first()
-    
-    if action == "unfollow" and existing:
-        db.session.delete(existing)
+    if action == "unfollow":
+        if unfollow_pair(me.id, target.id):
+            drop_timeline_author(me.id, target.id)
         is_following = False
-    elif action == "follow" and not existing:
-        db.session.add(Follow(follower_id=me.id, following_id=target.id))
-        is_following = True
     else:
-        is_following = existing is not None
+        if follow_pair(me.id, target.id):
+            backfill_timeline(me.id, target.id)
+        is_following = True
     
     db.session.commit()
-    
-    followers = db.session.query(Follow).filter(Follow.following_id == target.id).count()
+    bump_generations("feed")
     
     return jsonify({
         "is_following": is_following,
-        "followers": followers
+        "followers": target.followers_count
     })
 
 
@@ -1092,7 +3379,44 @@ def api_follow():
 def api_explore():
     """Keşfet (JSON)"""
     q = request.args.get("q", "").strip()
+    # 1h/24h pencereleri yazma olmadan da kayar: ETag saatlik de değişir
+    if q:
+        return _api_search(q)
+    
+    hour = int(time.time() // 3600)
+    etag = generation_etag("explore", suffix=f"-h{hour}")
+    nm = not_modified(etag)
+    if nm:
+        return nm
+    
+    payload = cached_result(("explore", hour), ("explore",), explore_payload)
+    return with_etag(jsonify(payload), etag)
+
+
+def _api_search(q: str):
+    try:
+        page = max(1, min(int(request.args.get("page", 1)), SEARCH_MAX_PAGES))
+    except ValueError:
+        page = 1
+    folded = search_fold(q)
+    
+    # Hit'lerin metnini, yazarını ya da rating'ini değiştiren her yazma "search"ü artırır
+    result = cached_result(
+        ("search", " ".join(search_terms(q)), page),
+        ("search",),
+        lambda: search_content(q, page),
+    )
     
+    symbols = [
+        {"key": key.upper(), "name": name, "change_pct": None, "comments": None}
+        for key, name in PRICE_SYMBOLS.items()
+        if page == 1 and (folded in key or folded in search_fold(name))
+    ]
+    
+    return jsonify({"query": q, "symbols": symbols, **result})
+
+
+def explore_payload():
     symbol_rows = trending_symbols_by_comments(limit=10)
     
     symbols = []
@@ -1102,7 +3426,9 @@ def api_explore():
             "key": key.upper(),
             "name": key.upper(),
             "change_pct": None,
-            "comments": row["cnt"]
+            "comments": row["cnt"],
+            "comments_1h": row["cnt_1h"],
+            "comments_24h": row["cnt_24h"],
         })
     
     top = top_posts_by_rating(limit=10)
@@ -1125,10 +3451,10 @@ def api_explore():
             }
         })
     
-    return jsonify({
+    return {
         "symbols": symbols,
         "posts": posts
-    })
+    }
 
 
 @app.route("/api/symbol/<symbol_key>/comments")
@@ -1137,32 +3463,31 @@ def api_symbol_comments(symbol_key):
     symbol_key = symbol_key.lower()
     if symbol_key not in PRICE_SYMBOLS:
         return jsonify({"error": "Invalid symbol"}), 404
+    tags = ("comments", f"comments:{symbol_key}")
+    etag = generation_etag(*tags)
+    nm = not_modified(etag)
+    if nm:
+        return nm
     
-    comments = (
-        db.session.query(SymbolComment)
-        .filter(SymbolComment.symbol_key == symbol_key)
-        .order_by(SymbolComment.created_at.desc())
-        .limit(100)
-        .all()
-    )
+    cursor = request.args.get("cursor")
+    limit = page_limit(100)
     
-    items = []
-    for c in comments:
-        u = db.session.get(User, c.user_id)
-        avg, cnt = comment_rating_summary(c.id)
-        items.append({
-            "id": c.id,
-            "content": c.content,
-            "created_at": c.created_at.isoformat(),
-            "user": {
-                "id": u.id,
-                "username": u.username,
-                "full_name": u.full_name,
-            } if u else None,
-            "rating": {"avg": avg, "cnt": cnt}
-        })
+    def compute():
+        comments, next_cursor = keyset_page(
+            db.session.query(SymbolComment).filter(SymbolComment.symbol_key == symbol_key),
+            (SymbolComment.created_at, SymbolComment.id),
+            cursor,
+            limit,
+        )
+        items = [comment_item_json(item) for item in hydrate_comments(comments)]
+        return {"items": items, "next_cursor": next_cursor}
+    
+    try:
+        payload = cached_result(("comments", symbol_key, cursor, limit), tags, compute)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
     
-    return jsonify({"items": items})
+    return with_etag(jsonify(payload), etag)
 
 
 @app.route("/api/symbol/<symbol_key>/comment", methods=["POST"])
@@ -1186,7 +3511,9 @@ def api_symbol_add_comment(symbol_key):
     
     c = SymbolComment(symbol_key=symbol_key, user_id=u.id, content=content)
     db.session.add(c)
+    record_symbol_comment(symbol_key)
     db.session.commit()
+    bump_generations("explore", "search", f"comments:{symbol_key}")
     
     return jsonify({
         "success": True,
@@ -1229,9 +3556,11 @@ def create_post():
     db.session.add(p)
     db.session.flush()
 
-    fe = FeedEvent(type="post", ref_id=p.id, score=1.0)
+    fe = FeedEvent(type="post", ref_id=p.id, score=1.0, hot=hot_rank(0, p.created_at))
     db.session.add(fe)
+    fanout_post(p)
     db.session.commit()
+    bump_generations("feed", "explore", "search")
 
     return redirect(request.referrer or url_for("feed"))
 
@@ -1246,27 +3575,13 @@ def rate_post(post_id):
     if stars < 1 or stars > 5:
         abort(400)
 
-    post = db.session.get(Post, post_id)
-    if not post:
+    row = apply_post_rating(post_id, u.id, stars)
+    if row is None:
         abort(404)
-
-    r = (
-        db.session.query(PostRating)
-        .filter(PostRating.post_id == post_id, PostRating.user_id == u.id)
-        .first()
-    )
-    if r:
-        r.stars = stars
-    else:
-        r = PostRating(post_id=post_id, user_id=u.id, stars=stars)
-        db.session.add(r)
-
-    avg, cnt = post_rating_summary(post_id)
-    fe = db.session.query(FeedEvent).filter(FeedEvent.type == "post", FeedEvent.ref_id == post_id).first()
-    if fe:
-        fe.score = float(avg) * (1.0 + (cnt / 10.0))
+    refresh_post_rank(post_id, row)
 
     db.session.commit()
+    bump_generations("feed", "explore", "search")
     return redirect(request.referrer or url_for("feed"))
 
 
@@ -1287,7 +3602,9 @@ def add_symbol_comment(symbol_key):
 
     c = SymbolComment(symbol_key=symbol_key, user_id=u.id, content=content[:2000])
     db.session.add(c)
+    record_symbol_comment(symbol_key)
     db.session.commit()
+    bump_generations("explore", "search", f"comments:{symbol_key}")
     return redirect(url_for("symbol_page", symbol_key=symbol_key))
 
 
@@ -1301,23 +3618,12 @@ def rate_comment(comment_id):
     if stars < 1 or stars > 5:
         abort(400)
 
-    c = db.session.get(SymbolComment, comment_id)
-    if not c:
+    row = apply_comment_rating(comment_id, u.id, stars)
+    if row is None:
         abort(404)
-
-    r = (
-        db.session.query(CommentRating)
-        .filter(CommentRating.comment_id == comment_id, CommentRating.user_id == u.id)
-        .first()
-    )
-    if r:
-        r.stars = stars
-    else:
-        r = CommentRating(comment_id=comment_id, user_id=u.id, stars=stars)
-        db.session.add(r)
-
     db.session.commit()
-    return redirect(request.referrer or url_for("symbol_page", symbol_key=c.symbol_key))
+    bump_generations("search", f"comments:{row.symbol_key}")
+    return redirect(request.referrer or url_for("symbol_page", symbol_key=row.symbol_key))
 
 
 @app.route("/api/follow/<username>", methods=["POST"])
@@ -1331,17 +3637,13 @@ def follow_user(username):
     if not target or target.id == me.id:
         abort(404)
 
-    existing = (
-        db.session.query(Follow)
-        .filter(Follow.follower_id == me.id, Follow.following_id == target.id)
-        .first()
-    )
-    if existing:
-        db.session.delete(existing)
-    else:
-        db.session.add(Follow(follower_id=me.id, following_id=target.id))
+    if unfollow_pair(me.id, target.id):
+        drop_timeline_author(me.id, target.id)
+    elif follow_pair(me.id, target.id):
+        backfill_timeline(me.id, target.id)
 
     db.session.commit()
+    bump_generations("feed")
     return redirect(url_for("profile", username=target.username))
 
 
@@ -1350,7 +3652,124 @@ def follow_user(username):
 # ----------------------------
 @app.route("/api/prices")
 def prices_api():
-    return jsonify(get_financial_data())
+    data = get_financial_data()
+    fields = price_field_status(data, time.time())
+    if data is not _last_good["data"]:
+        # Placeholder: her çağrıda yeni timestamp, ETag yok
+        return jsonify({**data, "fields": fields})
+
+    # Değerler aynı kalsa da alan durumu (live -> stale) değişebilir
+    etag = f"p{data['timestamp']}-" + "".join(v[0] for v in fields.values())
+    nm = not_modified(etag)
+    if nm:
+        return nm
+    return with_etag(jsonify({**data, "fields": fields}), etag)
+
+
+SSE_HEARTBEAT_SECONDS = 15
+# Bağlantı bu süre sonra kapanır, EventSource otomatik yeniden bağlanır
+SSE_MAX_SECONDS = int(os.environ.get("SSE_MAX_SECONDS", "300"))
+
+
+def _sse_default_max_streams() -> int:
+    """gevent worker'da (monkey patch'li) stream bir greenlet tutar: bağlantı
+    bütçesinin yarısı. Thread'li sunucuda (gthread, flask run) her stream bir
+    thread tutar: thread sayısının yarısı, kalanı normal isteklere."""
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is not None and monkey.is_module_patched("socket"):
+        return GUNICORN_WORKER_CONNECTIONS // 2
+    return max(1, GUNICORN_THREADS // 2)
+
+
+# Worker başına açık stream limiti; aşılırsa 503 ve istemci polling'e döner
+SSE_MAX_STREAMS = int(os.environ.get("SSE_MAX_STREAMS") or _sse_default_max_streams())
+_sse_streams = 0
+_sse_lock = threading.Lock()
+
+
+@app.route("/api/prices/stream")
+def prices_stream_api():
+    """Canlı fiyatlar (Server-Sent Events): sadece değer değişince push + heartbeat"""
+    global _sse_streams
+    _ensure_bg_started()
+    if _last_good["data"] is None:
+        _load_shared_snapshot()
+
+    with _sse_lock:
+        if _sse_streams >= SSE_MAX_STREAMS:
+            return jsonify({"error": "Too many streams"}), 503, {"Retry-After": "30"}
+        _sse_streams += 1
+
+    try:
+        seen = int(request.headers.get("Last-Event-ID") or 0)
+    except ValueError:
+        seen = 0
+
+    def generate():
+        nonlocal seen
+        yield "retry: 5000\n\n"
+        deadline = time.time() + SSE_MAX_SECONDS
+        while time.time() < deadline:
+            with _price_cond:
+                if _price_version == seen:
+                    _price_cond.wait(SSE_HEARTBEAT_SECONDS)
+                version = _price_version
+                data = _last_good["data"]
+
+            if version != seen and data:
+                seen = version
+                payload = {**data, "fields": price_field_status(data, time.time())}
+                yield f"id: {version}\nevent: prices\ndata: {json.dumps(payload)}\n\n"
+            else:
+                yield ": ping\n\n"
+
+    def release():
+        global _sse_streams
+        with _sse_lock:
+            _sse_streams -= 1
+
+    resp = Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    resp.call_on_close(release)
+    return resp
+
+
+@app.route("/api/prices/history")
+def prices_history_api():
+    """Fiyat geçmişi (server-side LTTB downsampling)"""
+    symbol_key = (request.args.get("symbol") or "").strip().lower()
+    if symbol_key not in HISTORY_KEYS:
+        return jsonify({"error": "Invalid symbol"}), 404
+
+    range_key = request.args.get("range", "1d")
+    span = HISTORY_RANGES.get(range_key)
+    if not span:
+        return jsonify({"error": "Invalid range"}), 400
+
+    try:
+        max_points = int(request.args.get("points", 500))
+    except ValueError:
+        max_points = 500
+    max_points = max(10, min(max_points, 2000))
+
+    now_ts = time.time()
+    start_ts = now_ts - span
+    with _history_lock:
+        ring = _history[symbol_key]
+        oldest = ring.oldest()
+        ts, px = ring.since(start_ts)
+
+    # Ring buffer aralığı kapsamıyorsa eski kısım DB'den
+    if oldest is None or oldest > start_ts:
+        db_ts, db_px = _history_from_db(symbol_key, start_ts, oldest or now_ts, max_points * 4)
+        ts = db_ts + list(ts)
+        px = db_px + list(px)
+
+    points = [[int(t), round(p, 6)] for t, p in _lttb(ts, px, max_points)]
+    return jsonify({"symbol": symbol_key, "range": range_key, "points": points})
 
 
 @app.route("/api/calendar")
@@ -1364,6 +3783,121 @@ def calendar_api():
     return jsonify(data)
 
 
+# ----------------------------
+# Internal
+# ----------------------------
+def _internal_allowed() -> bool:
+    """Yalnız loopback ya da X-Internal-Token başlığı"""
+    if INTERNAL_METRICS_TOKEN:
+        return request.headers.get("X-Internal-Token") == INTERNAL_METRICS_TOKEN
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+@app.route("/internal/metrics")
+def internal_metrics():
+    if not _internal_allowed():
+        abort(404)
+    data = sql_metrics.snapshot()
+    data.update({
+        "pid": os.getpid(),
+        "uptime_seconds": int(time.time() - sql_metrics.started_at),
+        "nplusone_threshold": NPLUSONE_THRESHOLD,
+        "result_cache": {"hits": result_cache.hits, "misses": result_cache.misses},
+    })
+    return jsonify(data)
+
+
+def _prom_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prom_histogram(lines, name, hist, labels=""):
+    sep = "," if labels else ""
+    for le, n in hist.cumulative():
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {n}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {hist.sum:.6f}")
+    lines.append(f"{name}_count{suffix} {hist.count}")
+
+
+def prometheus_text() -> str:
+    t = price_telemetry
+    now_ts = time.time()
+    lines = []
+
+    lines.append("# HELP price_provider_requests_total Fiyat sağlayıcı çağrıları (sonuca göre)")
+    lines.append("# TYPE price_provider_requests_total counter")
+    for (name, outcome), n in t.provider_calls.items():
+        lines.append(f'price_provider_requests_total{{provider="{_prom_label(name)}",outcome="{outcome}"}} {n}')
+
+    lines.append("# HELP price_provider_latency_seconds Sağlayıcı çağrı süresi (deadline'ı kaçıranlar hariç)")
+    lines.append("# TYPE price_provider_latency_seconds histogram")
+    for name, hist in t.provider_latency.items():
+        _prom_histogram(lines, "price_provider_latency_seconds", hist, f'provider="{_prom_label(name)}"')
+
+    lines.append("# HELP price_provider_consecutive_failures Art arda hata sayısı")
+    lines.append("# TYPE price_provider_consecutive_failures gauge")
+    for st in _provider_states:
+        lines.append(f'price_provider_consecutive_failures{{provider="{_prom_label(st.name)}"}} {st.failures}')
+    lines.append("# HELP price_provider_circuit_open Circuit breaker açık mı")
+    lines.append("# TYPE price_provider_circuit_open gauge")
+    for st in _provider_states:
+        lines.append(f'price_provider_circuit_open{{provider="{_prom_label(st.name)}"}} {int(st.open_until > now_ts)}')
+
+    lines.append("# HELP price_fallback_total Sabit fallback değerin kullanıldığı refresh sayısı")
+    lines.append("# TYPE price_fallback_total counter")
+    for k, n in t.fallbacks.items():
+        lines.append(f'price_fallback_total{{symbol="{k}"}} {n}')
+
+    lines.append("# HELP price_refresh_duration_seconds Çekim + yayın süresi")
+    lines.append("# TYPE price_refresh_duration_seconds histogram")
+    _prom_histogram(lines, "price_refresh_duration_seconds", t.refresh)
+    lines.append("# HELP price_refresh_total Fiyat refresh turları (snapshot yayınlandı / veri yok)")
+    lines.append("# TYPE price_refresh_total counter")
+    for result, n in t.refreshes.items():
+        lines.append(f'price_refresh_total{{result="{result}"}} {n}')
+
+    with _lock:
+        data = _last_good["data"]
+        snapshot_ts = _last_good["ts"]
+    lines.append("# HELP price_fetch_leader Bu worker fiyat fetcher lideri mi")
+    lines.append("# TYPE price_fetch_leader gauge")
+    lines.append(f"price_fetch_leader {int(_leader_fd is not None)}")
+    if data:
+        lines.append("# HELP price_snapshot_age_seconds Son snapshot'ın yaşı")
+        lines.append("# TYPE price_snapshot_age_seconds gauge")
+        lines.append(f"price_snapshot_age_seconds {now_ts - snapshot_ts:.3f}")
+        as_of = data.get("as_of") or {}
+        lines.append("# HELP price_field_age_seconds Alanın son canlı değerinin yaşı")
+        lines.append("# TYPE price_field_age_seconds gauge")
+        for k, ts in as_of.items():
+            if ts:
+                lines.append(f'price_field_age_seconds{{symbol="{k}"}} {now_ts - ts:.3f}')
+        lines.append("# HELP price_field_status Alanın durumu (live / stale / fallback / missing)")
+        lines.append("# TYPE price_field_status gauge")
+        for k, status in price_field_status(data, now_ts).items():
+            lines.append(f'price_field_status{{symbol="{k}",status="{status}"}} 1')
+
+    totals = sql_metrics.totals()
+    for metric, i, fmt, help_text in (
+        ("app_requests_total", 0, "{}", "Endpoint başına istek sayısı"),
+        ("app_sql_statements_total", 1, "{}", "Endpoint başına SQL statement sayısı"),
+        ("app_sql_seconds_total", 2, "{:.6f}", "Endpoint başına SQL süresi"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for ep, row in totals:
+            lines.append(f'{metric}{{endpoint="{_prom_label(ep)}"}} ' + fmt.format(row[i]))
+    return "\n".join(lines) + "\n"
+
+
+@app.route("/internal/metrics/prometheus")
+def internal_metrics_prometheus():
+    if not _internal_allowed():
+        abort(404)
+    return Response(prometheus_text(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # ----------------------------
 # Error pages
 # ----------------------------
@@ -1372,8 +3906,27 @@ def not_found(e):
     return "<h1>404</h1><p>Bulunamadı</p>", 404
 
 
+# ----------------------------
+# Process lifecycle
+# ----------------------------
+# gunicorn 'app:app' --preload: import DB'ye ve ağa dokunmaz (şema init-db ile
+# kurulur), worker'lar master'da yüklenen kodu fork ile paylaşır
+def _reset_after_fork():
+    """gunicorn --preload: master'da açılmış havuz bağlantıları child'da
+    paylaşılmasın (close=False: master'ın soketlerine dokunma)"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
 # ----------------------------
 # Run local
 # ----------------------------
 if __name__ == "__main__":
+    with app.app_context():
+        init_db()
     app.run(debug=True)
@@ -0,0 +1,6 @@
+"""Yük benchmark'ı: sentetik sosyal veri seti + API sürücüsü.
+
+    python -m bench.run --posts 10000
+    python -m bench.compare bench/results/eski.json bench/results/yeni.json
+    python -m bench.coldstart --runs 10
+"""
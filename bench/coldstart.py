@@ -0,0 +1,116 @@
+"""Soğuk başlangıç: yeni bir süreçte ilk yanıta kadar geçen süre.
+
+Varsayılan mod her denemede taze bir Python süreci açar, app'i import eder
+ve test client ile ilk isteği yapar (interpreter açılışı dahil duvar saati).
+--gunicorn verilirse gerçek bir gunicorn başlatıp portu ilk 200'e kadar yoklar.
+
+    python -m bench.coldstart --runs 10
+    python -m bench.coldstart --gunicorn --workers 4 --preload
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+_CHILD = """
+import sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app as m
+t1 = time.perf_counter()
+resp = m.app.test_client().get({path!r})
+t2 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "first_request_ms": (t2 - t1) * 1000, "status": resp.status_code}}))
+"""
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _inprocess_run(env, path):
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", _CHILD.format(root=ROOT, path=path)],
+                         env=env, capture_output=True, text=True, check=True)
+    row = json.loads(out.stdout.strip().splitlines()[-1])
+    row["wall_ms"] = (time.perf_counter() - started) * 1000
+    return row
+
+
+def _gunicorn_run(env, path, workers, preload, timeout=60):
+    port = _free_port()
+    cmd = [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+           "--workers", str(workers), "--config", os.path.join(ROOT, "gunicorn.conf.py"), "--chdir", ROOT]
+    if preload:
+        cmd.append("--preload")
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}{path}"
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=2) as resp:
+                    return {"wall_ms": (time.perf_counter() - started) * 1000, "status": resp.status}
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError("gunicorn zamanında yanıt vermedi")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--path", default="/api/feed")
+    ap.add_argument("--db", help="SQLite dosyası (varsayılan: geçici, init-db ile kurulur)")
+    ap.add_argument("--gunicorn", action="store_true")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--preload", action="store_true")
+    ap.add_argument("--out", help="sonuç JSON yolu")
+    args = ap.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="bench-coldstart-")
+    db_path = os.path.abspath(args.db or os.path.join(tmp, "cold.db"))
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", PRICE_SHARED_DIR=tmp)
+    # Şema ölçüm dışında, deploy'daki gibi bir kez
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "init-db"], cwd=ROOT, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+
+    rows = []
+    for _ in range(args.runs):
+        if args.gunicorn:
+            rows.append(_gunicorn_run(env, args.path, args.workers, args.preload))
+        else:
+            rows.append(_inprocess_run(env, args.path))
+
+    summary = {}
+    for key in ("wall_ms", "import_ms", "first_request_ms"):
+        vals = [r[key] for r in rows if key in r]
+        if vals:
+            summary[key] = {"median": round(statistics.median(vals), 1), "min": round(min(vals), 1),
+                            "max": round(max(vals), 1)}
+            print(f"{key:18s} median={summary[key]['median']}ms min={summary[key]['min']}ms max={summary[key]['max']}ms")
+
+    if args.out:
+        meta = {"mode": "gunicorn" if args.gunicorn else "inprocess", "runs": args.runs, "path": args.path,
+                "workers": args.workers if args.gunicorn else None, "preload": args.preload}
+        with open(args.out, "w") as f:
+            json.dump({"meta": meta, "summary": summary, "runs": rows}, f, indent=2)
+        print(f"📄 {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""İki benchmark sonucunu karşılaştırır; gerileme varsa exit code 1.
+
+    python -m bench.compare eski.json yeni.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("base")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=0.2, help="p95 için izin verilen oransal artış")
+    ap.add_argument("--metric", default="p95_ms")
+    args = ap.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)["scenarios"]
+    with open(args.new) as f:
+        new = json.load(f)["scenarios"]
+
+    regressions = []
+    print(f"{'scenario':16s} {args.metric:>12s} {'':>10s} {'change':>8s}   sql/req")
+    for name in sorted(set(base) & set(new)):
+        b, n = base[name], new[name]
+        bv, nv = b.get(args.metric), n.get(args.metric)
+        change = (nv - bv) / bv if bv and nv is not None else 0.0
+        bs, ns = b.get("sql_per_request"), n.get("sql_per_request")
+        flag = ""
+        if change > args.threshold:
+            flag = "  ⚠ latency"
+            regressions.append(name)
+        # cache isabetleri ortalamayı biraz oynatır; yarım statement'a kadar tolerans
+        if bs is not None and ns is not None and ns > bs + max(0.5, bs * args.threshold):
+            flag += "  ⚠ sql"
+            regressions.append(name)
+        print(f"{name:16s} {bv:>12} {nv:>10} {change:>+8.1%}   {bs} -> {ns}{flag}")
+
+    if regressions:
+        print(f"\n❌ Gerileme: {', '.join(sorted(set(regressions)))}")
+        return 1
+    print("\n✅ Gerileme yok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
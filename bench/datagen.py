@@ -0,0 +1,135 @@
+"""Seed'li sentetik veri üreteci.
+
+Aynı seed ve boyutlarla aynı satırları üretir (zaman damgaları üretim anına
+göre göreli). Satırlar Core executemany ile parça parça yazılır; denormalize
+kolonlar sonradan uygulamanın kendi rebuild fonksiyonlarıyla kurulur.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.security import generate_password_hash
+
+BENCH_PASSWORD = "bench-pass"
+
+WORDS = (
+    "altın gümüş bitcoin borsa bist dolar euro faiz enflasyon fed merkez bankası "
+    "yükseliş düşüş kırılım destek direnç hedef stop trend hacim rekor ons gram "
+    "portföy temettü halka arz kripto volatilite teknik analiz temel kısa uzun vade "
+    "alım satım fırsat risk kâr zarar piyasa endeks grafik mum formasyon"
+).split()
+
+POST_SYMBOLS = ("btc", "gold", "silver", "usd_try", "eur_try", "bist100", None, None)
+
+
+class _Writer:
+    """Satırları biriktirip chunk dolunca tek executemany ile yazar"""
+
+    def __init__(self, db, table, chunk):
+        self.db, self.table, self.chunk = db, table, chunk
+        self.rows = []
+        self.total = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.db.session.execute(self.table.insert(), self.rows)
+            self.db.session.commit()
+            self.total += len(self.rows)
+            self.rows = []
+
+
+def _skewed(rng, n):
+    """0..n-1 arası, küçük id'lere yığılan (ünlü hesaplar) dağılım"""
+    return min(n - 1, int(n * rng.random() ** 3))
+
+
+def _text(rng, lo, hi):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(lo, hi)))
+
+
+def populate(m, *, users, posts, follows_per_user=20, ratings_per_post=3,
+             comments_per_post=0.5, seed=42, days=30, chunk=10_000, log=print):
+    """m: içe aktarılmış app modülü. Boş bir veritabanını doldurur."""
+    rng = random.Random(seed)
+    db = m.db
+    anchor = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    span = days * 86400
+    pw_hash = generate_password_hash(BENCH_PASSWORD)
+
+    def when():
+        return anchor - timedelta(seconds=rng.randrange(span))
+
+    log(f"👤 {users} kullanıcı")
+    w = _Writer(db, m.User.__table__, chunk)
+    for i in range(users):
+        w.add({"id": i + 1, "username": f"u{i:07d}", "full_name": f"Bench User {i}",
+               "password_hash": pw_hash, "avatar_type": "ui", "created_at": anchor - timedelta(seconds=span)})
+    w.flush()
+
+    log("🔗 takipler")
+    w = _Writer(db, m.Follow.__table__, chunk)
+    for uid in range(1, users + 1):
+        targets = set()
+        for _ in range(min(follows_per_user, users - 1)):
+            t = _skewed(rng, users) + 1
+            if t != uid:
+                targets.add(t)
+        for t in sorted(targets):
+            w.add({"follower_id": uid, "following_id": t, "created_at": anchor - timedelta(seconds=span)})
+    w.flush()
+
+    log(f"📝 {posts} post + feed event")
+    wp = _Writer(db, m.Post.__table__, chunk)
+    post_times = []
+    for i in range(posts):
+        ts = when()
+        post_times.append(ts)
+        wp.add({"id": i + 1, "user_id": _skewed(rng, users) + 1, "content": _text(rng, 6, 30),
+                "symbol_key": rng.choice(POST_SYMBOLS), "created_at": ts})
+    wp.flush()
+    wf = _Writer(db, m.FeedEvent.__table__, chunk)
+    for i, ts in enumerate(post_times):
+        wf.add({"type": "post", "ref_id": i + 1, "score": 1.0, "created_at": ts})
+
+    n_alerts = max(1, posts // 1000)
+    wa = _Writer(db, m.PriceAlert.__table__, chunk)
+    for i in range(n_alerts):
+        ts = when()
+        wa.add({"id": i + 1, "symbol_key": rng.choice(POST_SYMBOLS[:6]), "window": rng.choice(("1h", "1d")),
+                "change_pct": round(rng.uniform(-15, 15), 2), "last_price": round(rng.uniform(10, 5000), 2),
+                "created_at": ts})
+        wf.add({"type": "alert", "ref_id": i + 1, "score": 1.0, "created_at": ts})
+    wa.flush()
+    wf.flush()
+
+    log("⭐ rating'ler")
+    w = _Writer(db, m.PostRating.__table__, chunk)
+    for pid in range(1, posts + 1):
+        raters = {_skewed(rng, users) + 1 for _ in range(int(rng.expovariate(1 / ratings_per_post)))}
+        for uid in sorted(raters):
+            w.add({"post_id": pid, "user_id": uid, "stars": rng.randint(1, 5), "created_at": post_times[pid - 1]})
+    w.flush()
+
+    n_comments = int(posts * comments_per_post)
+    log(f"💬 {n_comments} yorum")
+    w = _Writer(db, m.SymbolComment.__table__, chunk)
+    symbol_keys = sorted(m.PRICE_SYMBOLS)
+    for i in range(n_comments):
+        w.add({"id": i + 1, "symbol_key": rng.choice(symbol_keys), "user_id": _skewed(rng, users) + 1,
+               "content": _text(rng, 4, 20), "created_at": when()})
+    w.flush()
+
+    log("🛠 denormalize kolonlar")
+    with m.app.app_context():
+        m.rebuild_rating_aggregates()
+        m.rebuild_follow_counts()
+        m.rebuild_feed_ranks()
+        m.rebuild_symbol_trends()
+        m.rebuild_timelines()
+
+    return {"users": users, "posts": posts, "alerts": n_alerts, "comments": n_comments,
+            "follows_per_user": follows_per_user, "ratings_per_post": ratings_per_post, "seed": seed}
@@ -0,0 +1,260 @@
+"""API yük benchmark'ı.
+
+Varsayılan mod Flask test client ile süreç içi çalışır ve istek başına SQL
+statement sayısını da ölçer. --url verilirse yerel bir gunicorn'a HTTP ile
+gider (SQL sayımı o modda yok). Ağ erişimi gerekmez.
+
+    python -m bench.run --posts 10000 --requests 300
+    python -m bench.run --posts 1000000 --users 100000 --scenarios feed,profile
+    gunicorn app:app ... & python -m bench.run --db bench/data/p10000-s42.db --url http://127.0.0.1:8000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEARCH_WORDS = ("altın", "bitcoin", "faiz", "kırılım", "borsa", "dolar")
+
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return None
+    k = max(0, min(len(sorted_vals) - 1, int(round(p / 100.0 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[k]
+
+
+def _scenarios(meta, symbol_keys):
+    """isim -> (rng, user_id) -> (method, path, json_body)"""
+    users, posts = meta["users"], meta["posts"]
+    return {
+        "feed": lambda rng, uid: ("GET", f"/api/feed?filter={rng.choice(('all', 'posts', 'hot'))}", None),
+        "feed_following": lambda rng, uid: ("GET", "/api/feed?filter=following", None),
+        "explore": lambda rng, uid: ("GET", "/api/explore", None),
+        "search": lambda rng, uid: ("GET", f"/api/explore?q={rng.choice(SEARCH_WORDS)}", None),
+        "profile": lambda rng, uid: ("GET", f"/api/profile/u{rng.randrange(users):07d}", None),
+        "symbol_comments": lambda rng, uid: ("GET", f"/api/symbol/{rng.choice(symbol_keys)}/comments", None),
+        "rate": lambda rng, uid: ("POST", "/api/rate",
+                                  {"kind": "post", "id": rng.randrange(posts) + 1, "stars": rng.randint(1, 5)}),
+    }
+
+
+class _InProcess:
+    """Flask test client; her kullanıcı için session'ı doğrudan kurar"""
+
+    def __init__(self, m):
+        self.m = m
+        self._local = threading.local()
+        self._local_counts = threading.local()
+        from sqlalchemy import event
+
+        with m.app.app_context():
+            for engine in m.db.engines.values():  # replika dahil
+                event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self._local_counts.n = getattr(self._local_counts, "n", 0) + 1
+
+    def client(self, uid):
+        cache = self._local.__dict__.setdefault("clients", {})
+        if uid not in cache:
+            c = self.m.app.test_client()
+            with c.session_transaction() as s:
+                s["user_id"] = uid
+            cache[uid] = c
+        return cache[uid]
+
+    def request(self, uid, method, path, body):
+        self._local_counts.n = 0
+        c = self.client(uid)
+        t = time.perf_counter()
+        resp = c.open(path, method=method, json=body)
+        dt = time.perf_counter() - t
+        return resp.status_code, dt, self._local_counts.n
+
+
+class _Http:
+    """Çalışan bir sunucuya requests ile; kullanıcı başına login'li Session"""
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base = base_url.rstrip("/")
+        self._requests = requests
+        self._local = threading.local()
+
+    def session(self, uid):
+        cache = self._local.__dict__.setdefault("sessions", {})
+        if uid not in cache:
+            from bench.datagen import BENCH_PASSWORD
+
+            s = self._requests.Session()
+            s.post(f"{self.base}/api/auth/login", json={"username": f"u{uid - 1:07d}", "password": BENCH_PASSWORD})
+            cache[uid] = s
+        return cache[uid]
+
+    def request(self, uid, method, path, body):
+        s = self.session(uid)
+        t = time.perf_counter()
+        resp = s.request(method, self.base + path, json=body)
+        dt = time.perf_counter() - t
+        return resp.status_code, dt, None
+
+
+def run_scenario(driver, fn, *, requests_n, warmup, concurrency, users, seed):
+    rng_master = random.Random(seed)
+    plan = [(rng_master.randrange(users) + 1, random.Random(rng_master.random())) for _ in range(warmup + requests_n)]
+    for uid, rng in plan[:warmup]:
+        driver.request(uid, *fn(rng, uid))
+
+    latencies, stmts, errors = [], [], 0
+    lock = threading.Lock()
+
+    def one(item):
+        nonlocal errors
+        uid, rng = item
+        status, dt, n = driver.request(uid, *fn(rng, uid))
+        with lock:
+            latencies.append(dt)
+            if n is not None:
+                stmts.append(n)
+            if status >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    if concurrency <= 1:
+        for item in plan[warmup:]:
+            one(item)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, plan[warmup:]))
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "max_ms": ms(latencies[-1]) if latencies else None,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall > 0 else None,
+        "sql_per_request": round(sum(stmts) / len(stmts), 2) if stmts else None,
+        "sql_max": max(stmts) if stmts else None,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--posts", type=int, default=10_000)
+    ap.add_argument("--users", type=int, help="varsayılan: posts / 10")
+    ap.add_argument("--follows-per-user", type=int, default=20)
+    ap.add_argument("--ratings-per-post", type=float, default=3)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--db", help="SQLite dosyası (varsayılan bench/data/p<posts>-s<seed>.db, yoksa üretilir)")
+    ap.add_argument("--regen", action="store_true", help="veritabanını silip yeniden üret")
+    ap.add_argument("--replica", help="okuma replikası SQLite dosyası (yoksa veritabanından kopyalanır)")
+    ap.add_argument("--url", help="süreç içi yerine bu adresteki sunucuyu sür")
+    ap.add_argument("--scenarios", help="virgülle ayrılmış; varsayılan hepsi")
+    ap.add_argument("--requests", type=int, default=200, help="senaryo başına ölçülen istek")
+    ap.add_argument("--warmup", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--no-cache", action="store_true", help="result cache'i kapat (RESULT_CACHE_MAX_ENTRIES=0)")
+    ap.add_argument("--out", help="sonuç JSON yolu (varsayılan bench/results/<zaman>.json)")
+    args = ap.parse_args(argv)
+
+    users = args.users or max(10, args.posts // 10)
+    db_path = os.path.abspath(args.db or os.path.join(HERE, "data", f"p{args.posts}-s{args.seed}.db"))
+    meta_path = db_path + ".json"
+    if args.regen:
+        for p in (db_path, meta_path):
+            if os.path.exists(p):
+                os.remove(p)
+    fresh = not os.path.exists(meta_path)
+    if fresh and os.path.exists(db_path):
+        os.remove(db_path)  # yarım kalmış üretim
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    # app import edilmeden önce: veritabanı, paylaşılan dizin ve cache ayarı
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("PRICE_SHARED_DIR", tempfile.mkdtemp(prefix="bench-shared-"))
+    if args.no_cache:
+        os.environ["RESULT_CACHE_MAX_ENTRIES"] = "0"
+    replica_path = os.path.abspath(args.replica) if args.replica else None
+    if replica_path:
+        os.environ["DATABASE_REPLICA_URL"] = f"sqlite:///{replica_path}"
+    sys.path.insert(0, os.path.dirname(HERE))
+    import app as m
+
+    from bench.datagen import populate
+
+    with m.app.app_context():
+        m.init_db()
+    if fresh:
+        t = time.perf_counter()
+        with m.app.app_context():
+            meta = populate(m, users=users, posts=args.posts, follows_per_user=args.follows_per_user,
+                            ratings_per_post=args.ratings_per_post, seed=args.seed)
+        meta["generate_seconds"] = round(time.perf_counter() - t, 1)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        print(f"✅ Veri üretildi ({meta['generate_seconds']} sn): {db_path}")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if replica_path and (fresh or not os.path.exists(replica_path)):
+        shutil.copyfile(db_path, replica_path)
+
+    driver = _Http(args.url) if args.url else _InProcess(m)
+    scenarios = _scenarios(meta, sorted(m.PRICE_SYMBOLS))
+    names = args.scenarios.split(",") if args.scenarios else list(scenarios)
+
+    results = {}
+    for name in names:
+        r = run_scenario(driver, scenarios[name], requests_n=args.requests, warmup=args.warmup,
+                         concurrency=args.concurrency, users=meta["users"], seed=args.seed)
+        results[name] = r
+        print(f"{name:16s} p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms "
+              f"rps={r['throughput_rps']} sql/req={r['sql_per_request']} err={r['errors']}")
+
+    out = {
+        "meta": {
+            **meta,
+            "mode": "http" if args.url else "inprocess",
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "result_cache": not args.no_cache,
+            "replica": bool(replica_path),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "scenarios": results,
+    }
+    out_path = args.out or os.path.join(HERE, "results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(out, f, indent=2, ensure_ascii=False)
+    print(f"📄 {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""gunicorn ayarları; gunicorn çalışma dizinindeki bu dosyayı kendisi okur.
+
+Fiyat SSE stream'leri dakikalarca açık kalır. gevent worker'da her açık tab
+bir greenlet tutar (thread değil), böylece binlerce boşta tab tek worker'a
+sığar. GUNICORN_WORKER_CLASS=gthread eski thread'li davranışa döner.
+"""
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "2000"))
+timeout = 120
+
+if worker_class == "gevent":
+    # --preload'da app master'da import edilir; worker'ın kendi patch'i fork'tan
+    # sonra geldiği için app'in lock/condition/socket'leri patch'siz kalırdı
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    # psycopg2 C sürücüsü beklerken hub'ı bloklamasın
+    from psycogreen.gevent import patch_psycopg
+
+    patch_psycopg()